@@ -0,0 +1,116 @@
+"""
+Streaming consumer for action-frame strings.
+
+Action frames arrive many times per turn and most of each string is the
+full unit list, which we do not need. Only the event lists we track, plus
+turnInfo, are located by key and decoded with raw_decode; the rest of the
+frame is never parsed. Counts are kept per tile in fixed-size arrays over a
+rolling window of recent turns.
+"""
+from array import array
+from json import JSONDecoder
+
+from arena import ARENA_SIZE, NUM_TILES
+
+_decoder = JSONDecoder()
+
+# Player numbering inside action frames
+SELF = 1
+ENEMY = 2
+STRUCTURE_TYPES = (0, 1, 2)
+MOBILE_TYPES = (3, 4, 5)
+
+
+def decode_after(frame, key, start=0):
+    """Decode the JSON value following key, or None if key is absent."""
+    i = frame.find(key, start)
+    if i < 0:
+        return None
+    i += len(key)
+    while frame[i] in ' \t\r\n':
+        i += 1
+    return _decoder.raw_decode(frame, i)[0]
+
+
+class ActionFrameTracker:
+    def __init__(self, window=5):
+        self.window = window
+        self.turn = -1
+        # Rolling totals over the window
+        self.breaches = array('i', bytes(4 * NUM_TILES))
+        self.structure_damage = array('d', bytes(8 * NUM_TILES))
+        self.structure_deaths = array('i', bytes(4 * NUM_TILES))
+        # Per-turn contributions, one slot per turn in the window
+        self._breach_slots = [array('i', bytes(4 * NUM_TILES)) for _ in range(window)]
+        self._damage_slots = [array('d', bytes(8 * NUM_TILES)) for _ in range(window)]
+        self._death_slots = [array('i', bytes(4 * NUM_TILES)) for _ in range(window)]
+        self._slot = 0
+        self.frames_seen = 0
+        # Enemy mobile spawns of the latest action phase as (x, y, unit type),
+        # and the tiles it breached on, one entry per breach
+        self.enemy_spawns = []
+        self.enemy_breaches = []
+
+    def _roll(self, turn):
+        """Drop the oldest turn from the totals and reuse its slot."""
+        self.turn = turn
+        self._slot = (self._slot + 1) % self.window
+        self.enemy_spawns = []
+        self.enemy_breaches = []
+        for totals, slots in ((self.breaches, self._breach_slots), (self.structure_damage, self._damage_slots), (self.structure_deaths, self._death_slots)):
+            slot = slots[self._slot]
+            for i in range(NUM_TILES):
+                if slot[i]:
+                    totals[i] -= slot[i]
+                    slot[i] = 0
+
+    def consume(self, frame):
+        self.frames_seen += 1
+        turn_info = decode_after(frame, '"turnInfo":')
+        if turn_info is not None and turn_info[1] != self.turn:
+            self._roll(turn_info[1])
+        events = frame.find('"events":')
+        if events < 0:
+            return
+
+        spawns = decode_after(frame, '"spawn":', events)
+        if spawns:
+            for location, unit_type, _, player in spawns:
+                if player == ENEMY and unit_type in MOBILE_TYPES:
+                    self.enemy_spawns.append((location[0], location[1], unit_type))
+
+        breaches = decode_after(frame, '"breach":', events)
+        if breaches:
+            slot = self._breach_slots[self._slot]
+            for location, _, _, _, player in breaches:
+                if player == ENEMY:
+                    i = location[0] + ARENA_SIZE * location[1]
+                    self.breaches[i] += 1
+                    slot[i] += 1
+                    self.enemy_breaches.append((location[0], location[1]))
+
+        damage = decode_after(frame, '"damage":', events)
+        if damage:
+            slot = self._damage_slots[self._slot]
+            for location, amount, unit_type, _, player in damage:
+                if player == SELF and unit_type in STRUCTURE_TYPES:
+                    i = location[0] + ARENA_SIZE * location[1]
+                    self.structure_damage[i] += amount
+                    slot[i] += amount
+
+        deaths = decode_after(frame, '"death":', events)
+        if deaths:
+            slot = self._death_slots[self._slot]
+            for death in deaths:
+                location, unit_type, _, player, removed_by_owner = death[:5]
+                if player == SELF and unit_type in STRUCTURE_TYPES and not removed_by_owner:
+                    i = location[0] + ARENA_SIZE * location[1]
+                    self.structure_deaths[i] += 1
+                    slot[i] += 1
+
+    def scored_on_locations(self):
+        """Tiles the enemy breached within the window, most breached first."""
+        breaches = self.breaches
+        tiles = [i for i in range(NUM_TILES) if breaches[i]]
+        tiles.sort(key=lambda i: -breaches[i])
+        return [[i % ARENA_SIZE, i // ARENA_SIZE] for i in tiles]
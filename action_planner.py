@@ -0,0 +1,126 @@
+"""
+Turn-wide SP/MP budgeting for build and deploy actions.
+
+Helpers add candidate actions with a value instead of calling attempt_*
+themselves, so whichever helper runs first no longer eats the SP. solve()
+buys candidates greedily by value (insertion order breaks ties), skipping
+any it cannot afford so cheaper ones further down still fill the budget,
+and only keeps an upgrade on a tile spawned this turn if that spawn was
+bought. execute() then issues everything in one pass: one spawn call per
+structure type, one upgrade call, one removal call and one call per
+deploy stack.
+"""
+from collections import namedtuple
+
+from arena import ARENA_SIZE
+from board import EMPTY
+from maintenance import policy_actions
+
+SPAWN = 0
+UPGRADE = 1
+DEPLOY = 2
+
+Candidate = namedtuple('Candidate', ['kind', 'unit_type', 'location', 'count', 'cost', 'value', 'order'])
+TurnPlan = namedtuple('TurnPlan', ['spawns', 'upgrades', 'removals', 'deploys', 'sp', 'mp'])
+
+
+class ActionPlanner:
+    def __init__(self, board, sp, mp=0):
+        self.board = board
+        self.sp = sp
+        self.mp = mp
+        self.candidates = []
+        self.removals = []
+        # Flat index -> unit type of every spawn candidate
+        self._spawning = {}
+
+    def _add(self, kind, unit_type, location, count, cost, value):
+        self.candidates.append(Candidate(kind, unit_type, location, count, cost, value, len(self.candidates)))
+
+    def spawn(self, unit_type, locations, value):
+        board = self.board
+        cost = board.stats.get(unit_type).cost_sp
+        for location in locations:
+            i = location[0] + ARENA_SIZE * location[1]
+            if board.unit_type[i] == EMPTY and i not in self._spawning:
+                self._spawning[i] = unit_type
+                self._add(SPAWN, unit_type, location, 1, cost, value)
+
+    def upgrade(self, locations, value, unit_type=None):
+        """Upgrades our structures on locations, or ones spawned this turn, of unit_type if given."""
+        board = self.board
+        for location in locations:
+            i = location[0] + ARENA_SIZE * location[1]
+            if i in self._spawning:
+                t = self._spawning[i]
+            elif board.owner[i] == 0 and not board.upgraded[i] and not board.pending_removal[i]:
+                t = board.shorthands[board.unit_type[i]]
+            else:
+                continue
+            if unit_type is None or t == unit_type:
+                self._add(UPGRADE, t, location, 1, board.stats.get(t, True).cost_sp, value)
+
+    def remove(self, locations):
+        self.removals.extend(locations)
+
+    def add_policies(self, policies, turn_number, spawn_value, upgrade_value, upgrade=True):
+        """
+        Layout policies: missing tiles at spawn_value, which may be a function
+        of the location, and upgrades at upgrade_value minus their priority.
+        """
+        missing, removals, candidates = policy_actions(self.board, policies, turn_number, upgrade)
+        for policy in missing:
+            value = spawn_value(policy.location) if callable(spawn_value) else spawn_value
+            self.spawn(policy.unit_type, (policy.location,), value)
+        self.remove(removals)
+        for priority, _, location, _ in candidates:
+            self.upgrade((location,), upgrade_value - priority)
+
+    def deploy(self, unit_type, location, count, value):
+        """count=None deploys as many as the MP left after better deploys allows."""
+        self._add(DEPLOY, unit_type, location, count, self.board.stats.get(unit_type).cost_mp, value)
+
+    def solve(self):
+        sp, mp = self.sp, self.mp
+        spawns = []
+        upgrades = []
+        deploys = []
+        bought = set()
+        for candidate in sorted(self.candidates, key=lambda c: (-c.value, c.order)):
+            if candidate.kind == DEPLOY:
+                count = candidate.count
+                if count is None:
+                    count = int(mp // candidate.cost) if candidate.cost > 0 else 0
+                if count > 0 and count * candidate.cost <= mp:
+                    mp -= count * candidate.cost
+                    deploys.append((candidate.unit_type, candidate.location, count))
+                continue
+            if candidate.cost > sp:
+                continue
+            i = candidate.location[0] + ARENA_SIZE * candidate.location[1]
+            if candidate.kind == SPAWN:
+                bought.add(i)
+                spawns.append(candidate)
+            elif i in self._spawning and i not in bought:
+                continue
+            else:
+                upgrades.append(candidate)
+            sp -= candidate.cost
+        return TurnPlan(spawns, upgrades, list(self.removals), deploys, self.sp - sp, self.mp - mp)
+
+    def execute(self, game_state, plan=None):
+        if plan is None:
+            plan = self.solve()
+        board = self.board
+        by_type = {}
+        for candidate in plan.spawns:
+            by_type.setdefault(candidate.unit_type, []).append(candidate.location)
+        for unit_type, locations in by_type.items():
+            board.spawn(game_state, unit_type, locations)
+        if plan.upgrades:
+            board.upgrade(game_state, [candidate.location for candidate in plan.upgrades])
+        if plan.removals:
+            board.remove(game_state, plan.removals)
+        for unit_type, location, count in plan.deploys:
+            game_state.attempt_spawn(unit_type, location, count)
+        return plan
@@ -0,0 +1,67 @@
+"""
+Static geometry of the 28x28 diamond arena.
+
+Tiles are addressed by a flat index ``x + ARENA_SIZE * y`` so per-tile data
+can live in a single ``array`` instead of nested lists of GameUnits.
+"""
+from functools import lru_cache
+
+ARENA_SIZE = 28
+HALF_ARENA = 14
+NUM_TILES = ARENA_SIZE * ARENA_SIZE
+
+# Same ordering as gamelib.GameMap.get_edges()
+TOP_RIGHT = 0
+TOP_LEFT = 1
+BOTTOM_LEFT = 2
+BOTTOM_RIGHT = 3
+
+
+def in_arena_bounds(x, y):
+    if y < HALF_ARENA:
+        return HALF_ARENA - 1 - y <= x <= HALF_ARENA + y
+    return y < ARENA_SIZE and y - HALF_ARENA <= x <= ARENA_SIZE - 1 - (y - HALF_ARENA)
+
+
+def index(location):
+    return location[0] + ARENA_SIZE * location[1]
+
+
+def location(i):
+    return [i % ARENA_SIZE, i // ARENA_SIZE]
+
+
+IN_ARENA = bytearray(NUM_TILES)
+for _y in range(ARENA_SIZE):
+    for _x in range(ARENA_SIZE):
+        if in_arena_bounds(_x, _y):
+            IN_ARENA[_x + ARENA_SIZE * _y] = 1
+
+ARENA_TILES = tuple(i for i in range(NUM_TILES) if IN_ARENA[i])
+
+EDGES = (
+    tuple((HALF_ARENA + n, ARENA_SIZE - 1 - n) for n in range(HALF_ARENA)),
+    tuple((HALF_ARENA - 1 - n, ARENA_SIZE - 1 - n) for n in range(HALF_ARENA)),
+    tuple((HALF_ARENA - 1 - n, n) for n in range(HALF_ARENA)),
+    tuple((HALF_ARENA + n, n) for n in range(HALF_ARENA)),
+)
+
+
+@lru_cache(maxsize=None)
+def range_offsets(radius):
+    """
+    (dx, dy) offsets a unit with the given range reaches, using the same
+    ``distance < range + 0.51`` rule as gamelib's get_attackers.
+    """
+    limit = (radius + 0.51) ** 2
+    reach = int(radius + 1)
+    return tuple((dx, dy) for dx in range(-reach, reach + 1) for dy in range(-reach, reach + 1)
+                 if dx * dx + dy * dy < limit)
+
+
+@lru_cache(maxsize=None)
+def tiles_in_range(i, radius):
+    """Flat indices of arena tiles within range of tile i."""
+    x, y = i % ARENA_SIZE, i // ARENA_SIZE
+    return tuple((x + dx) + ARENA_SIZE * (y + dy) for dx, dy in range_offsets(radius)
+                 if 0 <= x + dx < ARENA_SIZE and 0 <= y + dy < ARENA_SIZE and IN_ARENA[(x + dx) + ARENA_SIZE * (y + dy)])
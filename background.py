@@ -0,0 +1,161 @@
+"""
+Next-turn analysis on a worker thread while the action phase plays out.
+
+After submit_turn() the process only decodes action frames until the next
+turn state arrives. Every structure either side will have next turn is
+already on the board in those frames: builds land before the first frame,
+after which structures only die or are removed at the end. submit() passes
+each frame to a worker thread. The worker rebuilds the board the newest
+frame implies for the next turn, and whenever that structure layout changes
+it reruns the strategy's analysis against private damage maps and a private
+path cache. collect() at the start of on_turn stops the worker and returns
+its last finished Speculation, which the turn only uses if the layout
+matches the real board. A worker that overruns collect() is left to stop
+on its own and its results are dropped; no second worker starts meanwhile.
+
+The worker never reads stdin, writes stdout or stderr, or touches the
+strategy's own state, so it cannot interleave with the engine protocol in
+gamelib.AlgoCore.start. A thread rather than a process: the frames already
+arrive in this process and the main thread is blocked on stdin between
+them, so there is nothing to gain from pickling boards across a process
+boundary.
+"""
+import json
+import queue
+import threading
+from collections import namedtuple
+
+from action_frames import decode_after
+from arena import ARENA_TILES
+from board import BoardSnapshot, EMPTY, STRUCTURE_TYPES
+from damage_map import DamageMap
+from pathing import PathCache, PathFinder
+
+# layout is the BoardSnapshot.layout_key() analysed, results maps
+# (query name, args) to the value for QueryCache.seed, and finders are the
+# PathFinders whose distance fields were filled on the way
+Speculation = namedtuple('Speculation', ['layout', 'results', 'finders'])
+
+# A worker exits when no frame arrives for this long, which is how it ends
+# after the last turn of a game
+IDLE_TIMEOUT = 5.0
+_STOP = None
+
+
+def next_turn_board(config, frame):
+    """The board an action frame implies for next turn, when removals have gone through."""
+    board = BoardSnapshot.from_state(config, json.loads(frame))
+    for i in ARENA_TILES:
+        if board.pending_removal[i]:
+            board.unit_type[i] = EMPTY
+            board.owner[i] = EMPTY
+            board.health[i] = 0
+            board.upgraded[i] = 0
+            board.pending_removal[i] = 0
+    return board
+
+
+def structure_died(frame):
+    for _, unit_type, *_ in decode_after(frame, '"death":') or ():
+        if unit_type in STRUCTURE_TYPES:
+            return True
+    return False
+
+
+class BackgroundAnalysis:
+    def __init__(self, config, analyse, path_cache_size=8, finder=PathFinder):
+        """
+        analyse(board, damage_maps, path_cache) is a generator of
+        ((query name, args), value) pairs. The worker stops between pairs
+        once collect() is called, so each step should be short.
+        """
+        self.config = config
+        self.analyse = analyse
+        self.path_cache_size = path_cache_size
+        self.finder = finder
+        self.latest = None
+        self.error = None
+        self._thread = None
+        self._frames = None
+        self._stop = None
+        # Bumped by collect(); a worker only publishes under the token it
+        # started with, so a late finish from a turn already played is dropped
+        self._token = 0
+        self._lock = threading.Lock()
+
+    def submit(self, frame):
+        thread = self._thread
+        if thread is None or self._stop.is_set() or not thread.is_alive():
+            if thread is not None and thread.is_alive():
+                # Last turn's worker has not reached a stopping point yet;
+                # never run two, this action phase just goes unanalysed
+                return
+            self._frames = queue.Queue()
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(self._frames, self._stop, self._token), daemon=True)
+            self._thread.start()
+        self._frames.put(frame)
+
+    def collect(self, timeout=0.05):
+        """
+        Stops the worker, waiting at most timeout seconds for its current
+        step, and returns the newest finished Speculation or None. A worker
+        still busy after that keeps its thread, so submit() will not start
+        another beside it, but nothing it finishes is used.
+        """
+        if self._thread is not None and not self._stop.is_set():
+            self._stop.set()
+            self._frames.put(_STOP)
+            self._thread.join(timeout)
+        with self._lock:
+            self._token += 1
+            speculation, self.latest = self.latest, None
+        return speculation
+
+    def _publish(self, token, speculation=None, error=None):
+        with self._lock:
+            if token != self._token:
+                return
+            if error is None:
+                self.latest = speculation
+            else:
+                self.error = error
+
+    def _run(self, frames, stop, token):
+        layout = None
+        while True:
+            try:
+                frame = frames.get(timeout=IDLE_TIMEOUT)
+            except queue.Empty:
+                return
+            # Only the newest frame's board matters, but it is only worth
+            # rebuilding after a structure died
+            changed = layout is None
+            while frame is not _STOP:
+                changed = changed or structure_died(frame)
+                try:
+                    frame = frames.get_nowait()
+                except queue.Empty:
+                    break
+            if frame is _STOP or stop.is_set():
+                return
+            if not changed:
+                continue
+            try:
+                board = next_turn_board(self.config, frame)
+                key = board.layout_key()
+                if key == layout:
+                    continue
+                damage_maps = [DamageMap.from_board(board, 0), DamageMap.from_board(board, 1)]
+                path_cache = PathCache(self.path_cache_size, self.finder)
+                results = {}
+                for query, value in self.analyse(board, damage_maps, path_cache):
+                    if stop.is_set():
+                        return
+                    results[query] = value
+                layout = key
+                self._publish(token, Speculation(key, results, path_cache.finders()))
+            except Exception as error:
+                # Reported by the main thread; the turn just runs without a speculation
+                self._publish(token, error=error)
+                return
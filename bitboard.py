@@ -0,0 +1,360 @@
+"""
+Bitboards: sets of arena tiles as Python ints.
+
+Bit i of a bitboard is the tile with flat index i (``x + 28 * y``). The arena,
+each edge and each layout become one int, and Occupancy keeps a board's
+structures as one int per type and per owner. Set questions such as "which
+layout tiles are empty" or "are the corners all turrets" are then one or two
+big-int operations instead of a loop over tiles.
+
+Four shifts, two of them masked so a step off column 0 or 27 does not wrap
+to the neighbouring row, give the neighbours of every tile in a set at
+once. A BFS then moves a whole frontier per step. BitPathFinder keeps each
+distance field as a list of layers, one int per distance, and does one
+expansion per layer instead of one deque visit per tile.
+
+Walks are set up with bitboards too. For each direction, one mask per field
+holds the tiles whose neighbour that way is one step closer. gamelib's
+tie-breaking depends only on which neighbours are closer, the previous move
+and the target edge, so a 16-entry table per previous move gives every
+tile's next step. For a field walked more than once, those choices are
+unpacked into one byte per tile, and each step of a walk is then one byte
+lookup instead of a comparison of four neighbours. A field's first walk
+reads the masks directly.
+Paths are the same as PathFinder's and gamelib's find_path_to_edge, tile
+for tile, so BitPathFinder is a drop-in PathFinder for PathCache.
+
+    python bitboard.py game-configs.json
+"""
+from arena import ARENA_SIZE, HALF_ARENA, NUM_TILES, ARENA_TILES, EDGES, TOP_RIGHT, TOP_LEFT, BOTTOM_RIGHT
+from pathing import VERTICAL, HORIZONTAL, get_target_edge, _better_direction
+from zobrist import STRUCTURE_KINDS
+
+ROW = (1 << ARENA_SIZE) - 1
+# Steps in gamelib's neighbour order: up, down, right, left
+_OFFSETS = (ARENA_SIZE, -ARENA_SIZE, 1, -1)
+
+
+def mask_of(locations):
+    mask = 0
+    for x, y in locations:
+        mask |= 1 << (x + ARENA_SIZE * y)
+    return mask
+
+
+def tiles(mask):
+    """Flat indices of the set bits, lowest first."""
+    found = []
+    while mask:
+        low = mask & -mask
+        found.append(low.bit_length() - 1)
+        mask ^= low
+    return found
+
+
+def locations(mask):
+    return [[i % ARENA_SIZE, i // ARENA_SIZE] for i in tiles(mask)]
+
+
+ARENA = sum(1 << i for i in ARENA_TILES)
+EDGE_MASKS = tuple(mask_of(edge) for edge in EDGES)
+_NOT_LEFT_COLUMN = ARENA & ~sum(1 << (ARENA_SIZE * y) for y in range(ARENA_SIZE))
+_NOT_RIGHT_COLUMN = ARENA & ~sum(1 << (ARENA_SIZE - 1 + ARENA_SIZE * y) for y in range(ARENA_SIZE))
+# bytes.translate tables: a blocked bytearray to '0'/'1' digits, and
+# binary digits to step codes (1 + index into _OFFSETS)
+_DIGITS = bytes([ord('0')] + [ord('1')] * 255)
+_CODES = tuple(bytes(k + 1 if c == ord('1') else 0 for c in range(256)) for k in range(4))
+
+
+def _choice(pattern, move_direction, right, up):
+    """Index into _OFFSETS that PathFinder._walk takes when the pattern's neighbours are closer."""
+    centre = HALF_ARENA + ARENA_SIZE * HALF_ARENA
+    best = choice = None
+    for k, offset in enumerate(_OFFSETS):
+        if pattern >> k & 1 and (best is None or _better_direction(
+                HALF_ARENA, HALF_ARENA, centre + offset, best, move_direction, right, up)):
+            best, choice = centre + offset, k
+    return choice
+
+
+# (right, up) -> previous move direction -> closer-neighbour pattern -> step
+_CHOICES = {(right, up): tuple(tuple(_choice(pattern, move_direction, right, up) for pattern in range(16))
+                               for move_direction in (0, HORIZONTAL, VERTICAL))
+            for right in (False, True) for up in (False, True)}
+
+
+def from_bytes(flags):
+    """Bitboard of the non-zero entries of a NUM_TILES bytearray, e.g. BoardSnapshot.blocked()."""
+    return int(bytes(flags).translate(_DIGITS)[::-1], 2)
+
+
+def to_codes(mask, code_table):
+    """NUM_TILES bytes, highest tile first, translated from each tile's bit through a _CODES table."""
+    return format(mask, '0{}b'.format(NUM_TILES)).encode().translate(code_table)
+
+
+def expand(mask):
+    """Arena tiles next to any tile of mask, mask itself not included unless adjacent."""
+    return ((mask << ARENA_SIZE) | (mask >> ARENA_SIZE)
+            | ((mask & _NOT_RIGHT_COLUMN) << 1) | ((mask & _NOT_LEFT_COLUMN) >> 1)) & ARENA
+
+
+def bfs_layers(sources, open_tiles):
+    """[tiles at distance 0, tiles at distance 1, ...] from sources through open_tiles."""
+    frontier = sources & open_tiles
+    seen = frontier
+    layers = []
+    while frontier:
+        layers.append(frontier)
+        frontier = expand(frontier) & open_tiles & ~seen
+        seen |= frontier
+    return layers
+
+
+def closer_neighbours(layers):
+    """Per direction in _OFFSETS, the tiles whose neighbour that way is one layer closer."""
+    up = down = right = left = 0
+    for d in range(1, len(layers)):
+        layer, closer = layers[d], layers[d - 1]
+        up |= layer & (closer >> ARENA_SIZE)
+        down |= layer & (closer << ARENA_SIZE)
+        right |= layer & (closer >> 1)
+        left |= layer & (closer << 1)
+    return up, down, right & _NOT_RIGHT_COLUMN, left & _NOT_LEFT_COLUMN
+
+
+def flood(start, open_tiles):
+    """The open tiles connected to the start bit."""
+    region = start & open_tiles
+    frontier = region
+    while frontier:
+        frontier = expand(frontier) & open_tiles & ~region
+        region |= frontier
+    return region
+
+
+class Occupancy:
+    """
+    Structures on a board as one bitboard per type and per owner.
+    BoardSnapshot.occupancy() builds one on first use and keeps it in step
+    with its own spawns, upgrades and removals.
+    """
+    __slots__ = ('types', 'owners', 'upgraded', 'pending_removal')
+
+    def __init__(self):
+        self.types = [0] * STRUCTURE_KINDS
+        self.owners = [0, 0]
+        self.upgraded = 0
+        self.pending_removal = 0
+
+    @classmethod
+    def from_board(cls, board):
+        occupancy = cls()
+        types, owners = occupancy.types, occupancy.owners
+        unit_type, owner = board.unit_type, board.owner
+        for i in ARENA_TILES:
+            t = unit_type[i]
+            if t >= 0:
+                bit = 1 << i
+                types[t] |= bit
+                owners[owner[i]] |= bit
+        occupancy.upgraded = from_bytes(board.upgraded)
+        occupancy.pending_removal = from_bytes(board.pending_removal)
+        return occupancy
+
+    def copy(self):
+        occupancy = Occupancy()
+        occupancy.types = list(self.types)
+        occupancy.owners = list(self.owners)
+        occupancy.upgraded = self.upgraded
+        occupancy.pending_removal = self.pending_removal
+        return occupancy
+
+    def add(self, i, unit_type, owner):
+        """A new, unupgraded structure on tile i."""
+        bit = 1 << i
+        self.types[unit_type] |= bit
+        self.owners[owner] |= bit
+        self.upgraded &= ~bit
+        self.pending_removal &= ~bit
+
+    @property
+    def structures(self):
+        return self.owners[0] | self.owners[1]
+
+    def open_tiles(self):
+        return ARENA & ~self.structures
+
+    def of(self, unit_type=None, owner=None):
+        """Tiles holding a structure of the type index and owner, either None for any."""
+        mask = self.structures if unit_type is None else self.types[unit_type]
+        return mask if owner is None else mask & self.owners[owner]
+
+    def empty(self, layout):
+        """The tiles of a layout bitboard with no structure on them."""
+        return layout & ~self.structures
+
+
+class BitPathFinder:
+    def __init__(self, blocked):
+        # blocked is a NUM_TILES bytearray, non-zero where a structure
+        # stands, kept as is for PathCache keys
+        self.blocked = blocked
+        self.open = ARENA & ~from_bytes(blocked)
+        # target edge, or (target edge, region), -> _Field
+        self._fields = {}
+
+    def _edge_field(self, target_edge):
+        field = self._fields.get(target_edge)
+        if field is None:
+            field = self._fields[target_edge] = _Field(EDGE_MASKS[target_edge], self.open, target_edge)
+        return field
+
+    def _ideal_field(self, start, target_edge):
+        region = flood(1 << start, self.open)
+        # Regions are disjoint, so their lowest tile names them
+        key = (target_edge, region & -region)
+        field = self._fields.get(key)
+        if field is None:
+            # Deepest tile towards the target edge, as in PathFinder._ideal_field
+            if target_edge in (TOP_RIGHT, TOP_LEFT):
+                row = (region.bit_length() - 1) // ARENA_SIZE
+            else:
+                row = ((region & -region).bit_length() - 1) // ARENA_SIZE
+            bits = (region >> (ARENA_SIZE * row)) & ROW
+            x = bits.bit_length() - 1 if target_edge in (TOP_RIGHT, BOTTOM_RIGHT) else (bits & -bits).bit_length() - 1
+            field = self._fields[key] = _Field(1 << (x + ARENA_SIZE * row), self.open, target_edge)
+        return field
+
+    def path_to_edge(self, start_location, target_edge=None):
+        """Same result as PathFinder.path_to_edge."""
+        start = start_location[0] + ARENA_SIZE * start_location[1]
+        if not self.open >> start & 1:
+            return None
+        if target_edge is None:
+            target_edge = get_target_edge(start_location)
+        field = self._edge_field(target_edge)
+        if not field.reached >> start & 1:
+            field = self._ideal_field(start, target_edge)
+        offsets = _OFFSETS
+        current = start
+        path = [[start_location[0], start_location[1]]]
+        code = field.step(start, 0)
+        field.walks += 1
+        # A field walked once, like most small walled-off regions, is not
+        # worth a step table
+        if field.walks == 1:
+            while code:
+                current += offsets[code - 1]
+                code = field.step(current, VERTICAL if code <= 2 else HORIZONTAL)
+                path.append([current % ARENA_SIZE, current // ARENA_SIZE])
+            return path
+        steps = field.steps()
+        while code:
+            current += offsets[code - 1]
+            # Codes 1 and 2 are vertical steps
+            code = steps[VERTICAL if code <= 2 else HORIZONTAL][current]
+            path.append([current % ARENA_SIZE, current // ARENA_SIZE])
+        return path
+
+
+class _Field:
+    """A BFS distance field and, once walked, its step codes."""
+    __slots__ = ('layers', 'reached', 'choices', 'walks', '_closer', '_steps')
+
+    def __init__(self, sources, open_tiles, target_edge):
+        self.layers = bfs_layers(sources, open_tiles)
+        self.reached = 0
+        for layer in self.layers:
+            self.reached |= layer
+        self.choices = _CHOICES[target_edge in (TOP_RIGHT, BOTTOM_RIGHT), target_edge in (TOP_RIGHT, TOP_LEFT)]
+        self.walks = 0
+        self._closer = None
+        self._steps = None
+
+    def step(self, i, move_direction):
+        """Step code from tile i after a move in move_direction, 0 for none, without the table."""
+        if self._closer is None:
+            self._closer = closer_neighbours(self.layers)
+        pattern = 0
+        for k, mask in enumerate(self._closer):
+            pattern |= (mask >> i & 1) << k
+        return 0 if pattern == 0 else self.choices[move_direction][pattern] + 1
+
+    def steps(self):
+        """
+        Indexed by HORIZONTAL or VERTICAL for the previous move, NUM_TILES
+        bytes holding each tile's next step as 1 + index into _OFFSETS, 0
+        where the walk ends.
+        """
+        if self._steps is None:
+            if self._closer is None:
+                self._closer = closer_neighbours(self.layers)
+            # Split the tiles by which neighbours are closer
+            groups = {0: self.reached & ~self.layers[0]}
+            for k, mask in enumerate(self._closer):
+                split = {}
+                for pattern, group in groups.items():
+                    if group & mask:
+                        split[pattern | 1 << k] = group & mask
+                    if group & ~mask:
+                        split[pattern] = group & ~mask
+                groups = split
+            steps = [None]
+            for by_pattern in self.choices[HORIZONTAL:VERTICAL + 1]:
+                by_step = [0, 0, 0, 0]
+                for pattern, group in groups.items():
+                    by_step[by_pattern[pattern]] |= group
+                codes = 0
+                for k, mask in enumerate(by_step):
+                    if mask:
+                        codes |= int.from_bytes(to_codes(mask, _CODES[k]), 'big')
+                steps.append(codes.to_bytes(NUM_TILES, 'little'))
+            self._steps = steps
+        return self._steps
+
+
+def benchmark(config, layouts=50, structures=60, seed=0):
+    """
+    Seconds per layout to path every start on both bottom edges with
+    gamelib's find_path_to_edge, PathFinder and BitPathFinder, after
+    checking all three agree.
+    """
+    import json
+    import random
+    import time
+    import gamelib
+    from pathing import PathFinder
+
+    rng = random.Random(seed)
+    starts = [list(location) for location in EDGES[2] + EDGES[3]]
+    states = []
+    for _ in range(layouts):
+        placed = rng.sample(ARENA_TILES, structures)
+        units = [[[i % ARENA_SIZE, i // ARENA_SIZE, 60.0, ''] for i in placed[:structures // 2]]] + [[] for _ in range(7)]
+        enemy = [[[i % ARENA_SIZE, i // ARENA_SIZE, 60.0, ''] for i in placed[structures // 2:]]] + [[] for _ in range(7)]
+        state = {'turnInfo': [0, 0, 0, 0], 'p1Stats': [30, 40, 5, 0], 'p2Stats': [30, 40, 5, 0],
+                 'p1Units': units, 'p2Units': enemy, 'events': {}}
+        states.append(gamelib.GameState(config, json.dumps(state)))
+    blocked = [PathFinder.from_game_state(game_state).blocked for game_state in states]
+
+    timings = {}
+    paths = {}
+    for name, run in (('find_path_to_edge', lambda game_state, b: [game_state.find_path_to_edge(s) for s in starts]),
+                      ('PathFinder', lambda game_state, b: list(map(PathFinder(b).path_to_edge, starts))),
+                      ('BitPathFinder', lambda game_state, b: list(map(BitPathFinder(b).path_to_edge, starts)))):
+        start = time.perf_counter()
+        paths[name] = [run(game_state, b) for game_state, b in zip(states, blocked)]
+        timings[name] = (time.perf_counter() - start) / layouts
+    if not paths['find_path_to_edge'] == paths['PathFinder'] == paths['BitPathFinder']:
+        raise AssertionError('Path finders disagree')
+    return timings
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+    with open(sys.argv[1]) as config_file:
+        config = json.load(config_file)
+    for name, seconds in benchmark(config).items():
+        print('{:<20}{:>10.2f} ms per layout'.format(name, seconds * 1000))
@@ -0,0 +1,212 @@
+"""
+Compact per-turn snapshot of the structures on the board.
+
+Unit type, owner, health, upgraded and pending-removal flags are packed into
+flat arrays indexed by ``x + 28 * y`` once at the start of a turn, so the
+strategy never walks game_map's nested lists of GameUnits again. Our own
+spawns, upgrades and removals go through the snapshot so it stays in step
+with the GameState for the rest of the turn.
+"""
+from array import array
+
+from arena import ARENA_SIZE, NUM_TILES, ARENA_TILES
+from bitboard import Occupancy
+from unit_stats import unit_stats
+from zobrist import board_hash, structure_hash
+
+EMPTY = -1
+# Positions in a state's p1Units/p2Units lists, which follow unitInformation
+STRUCTURE_TYPES = (0, 1, 2)
+REMOVE_LIST = 6
+UPGRADE_LIST = 7
+
+
+class BoardSnapshot:
+    def __init__(self, config):
+        self.config = config
+        self.stats = unit_stats(config)
+        self.shorthands = [unit["shorthand"] for unit in config["unitInformation"]]
+        self.type_index = {shorthand: i for i, shorthand in enumerate(self.shorthands)}
+        self.unit_type = array('b', [EMPTY]) * NUM_TILES
+        self.owner = array('b', [EMPTY]) * NUM_TILES
+        self.health = array('d', bytes(8 * NUM_TILES))
+        self.upgraded = bytearray(NUM_TILES)
+        self.pending_removal = bytearray(NUM_TILES)
+        # Bumped by every spawn/upgrade/remove that changed the board
+        self.generation = 0
+        # Zobrist hash of the layout, computed on first use and then kept
+        # up to date by spawn() and upgrade()
+        self._hash = None
+        # Structure bitboards, the same way
+        self._occupancy = None
+
+    @classmethod
+    def from_game_state(cls, game_state):
+        board = cls(game_state.config)
+        game_map = game_state.game_map
+        type_index = board.type_index
+        for i in ARENA_TILES:
+            for unit in game_map[i % ARENA_SIZE, i // ARENA_SIZE]:
+                if unit.stationary:
+                    board.unit_type[i] = type_index[unit.unit_type]
+                    board.owner[i] = unit.player_index
+                    board.health[i] = unit.health
+                    board.upgraded[i] = unit.upgraded
+                    board.pending_removal[i] = unit.pending_removal
+        return board
+
+    @classmethod
+    def from_state(cls, config, state):
+        """Snapshot straight from a parsed turn state or action frame, without a GameState."""
+        board = cls(config)
+        for owner, key in ((0, 'p1Units'), (1, 'p2Units')):
+            units = state[key]
+            for t in STRUCTURE_TYPES:
+                for x, y, health, *_ in units[t]:
+                    i = x + ARENA_SIZE * y
+                    board.unit_type[i] = t
+                    board.owner[i] = owner
+                    board.health[i] = health
+            for x, y, *_ in units[REMOVE_LIST]:
+                board.pending_removal[x + ARENA_SIZE * y] = 1
+            for x, y, *_ in units[UPGRADE_LIST]:
+                board.upgraded[x + ARENA_SIZE * y] = 1
+        return board
+
+    def copy(self):
+        board = BoardSnapshot.__new__(BoardSnapshot)
+        board.config = self.config
+        board.stats = self.stats
+        board.shorthands = self.shorthands
+        board.type_index = self.type_index
+        board.unit_type = array('b', self.unit_type)
+        board.owner = array('b', self.owner)
+        board.health = array('d', self.health)
+        board.upgraded = bytearray(self.upgraded)
+        board.pending_removal = bytearray(self.pending_removal)
+        board.generation = self.generation
+        board._hash = self._hash
+        board._occupancy = None if self._occupancy is None else self._occupancy.copy()
+        return board
+
+    def stats_at(self, i):
+        """UnitStats of the structure on tile i at its upgrade level."""
+        return self.stats.levels[self.upgraded[i]][self.unit_type[i]]
+
+    def contains_stationary_unit(self, location):
+        return self.unit_type[location[0] + ARENA_SIZE * location[1]] != EMPTY
+
+    def unit_type_at(self, location):
+        t = self.unit_type[location[0] + ARENA_SIZE * location[1]]
+        return None if t == EMPTY else self.shorthands[t]
+
+    def is_type(self, location, unit_type):
+        return self.unit_type[location[0] + ARENA_SIZE * location[1]] == self.type_index[unit_type]
+
+    def health_at(self, location):
+        return self.health[location[0] + ARENA_SIZE * location[1]]
+
+    def is_upgraded(self, location):
+        return bool(self.upgraded[location[0] + ARENA_SIZE * location[1]])
+
+    def select(self, locations, unit_type=None, owner=0, upgraded=None, below=None, at_least=None):
+        """
+        The given locations, in order, whose structure matches every filter.
+        e.g. select(walls, WALL, upgraded=True, below=80) is all of our
+        upgraded walls with less than 80 health.
+        """
+        types, owners, health, flags = self.unit_type, self.owner, self.health, self.upgraded
+        wanted = EMPTY if unit_type is None else self.type_index[unit_type]
+        selected = []
+        for location in locations:
+            i = location[0] + ARENA_SIZE * location[1]
+            t = types[i]
+            if t == EMPTY or (wanted != EMPTY and t != wanted):
+                continue
+            if owner is not None and owners[i] != owner:
+                continue
+            if upgraded is not None and bool(flags[i]) != upgraded:
+                continue
+            if below is not None and health[i] >= below:
+                continue
+            if at_least is not None and health[i] < at_least:
+                continue
+            selected.append(location)
+        return selected
+
+    def layout_key(self):
+        """Types, owners and upgrades of every tile; boards with equal keys path and deal damage alike."""
+        return self.unit_type.tobytes() + self.owner.tobytes() + bytes(self.upgraded)
+
+    def zobrist(self):
+        """64-bit hash of layout_key(), see zobrist.py."""
+        if self._hash is None:
+            self._hash = board_hash(self)
+        return self._hash
+
+    def occupancy(self):
+        """The structures as bitboards (bitboard.Occupancy), e.g. for queries against Layout.mask."""
+        if self._occupancy is None:
+            self._occupancy = Occupancy.from_board(self)
+        return self._occupancy
+
+    def blocked(self):
+        """NUM_TILES bytearray with 1 wherever a structure stands, for PathFinder."""
+        return bytearray(t != EMPTY for t in self.unit_type)
+
+    def spawn(self, game_state, unit_type, locations):
+        """attempt_spawn for structures, recording each successful placement."""
+        if locations and isinstance(locations[0], int):
+            locations = [locations]
+        t = self.type_index[unit_type]
+        start_health = self.stats.levels[0][t].health
+        spawned = 0
+        for location in locations:
+            if game_state.attempt_spawn(unit_type, location):
+                i = location[0] + ARENA_SIZE * location[1]
+                self.unit_type[i] = t
+                self.owner[i] = 0
+                self.health[i] = start_health
+                self.upgraded[i] = 0
+                self.pending_removal[i] = 0
+                if self._hash is not None:
+                    self._hash ^= structure_hash(i, (t, 0, 0))
+                if self._occupancy is not None:
+                    self._occupancy.add(i, t, 0)
+                spawned += 1
+        if spawned:
+            self.generation += 1
+        return spawned
+
+    def upgrade(self, game_state, locations):
+        if locations and isinstance(locations[0], int):
+            locations = [locations]
+        upgraded = 0
+        for location in locations:
+            if game_state.attempt_upgrade(location):
+                i = location[0] + ARENA_SIZE * location[1]
+                if self._hash is not None and not self.upgraded[i]:
+                    self._hash ^= structure_hash(i, (self.unit_type[i], self.owner[i], 0))
+                    self._hash ^= structure_hash(i, (self.unit_type[i], self.owner[i], 1))
+                self.upgraded[i] = 1
+                if self._occupancy is not None:
+                    self._occupancy.upgraded |= 1 << i
+                upgraded += 1
+        if upgraded:
+            self.generation += 1
+        return upgraded
+
+    def remove(self, game_state, locations):
+        if locations and isinstance(locations[0], int):
+            locations = [locations]
+        removed = 0
+        for location in locations:
+            if game_state.attempt_remove(location):
+                i = location[0] + ARENA_SIZE * location[1]
+                self.pending_removal[i] = 1
+                if self._occupancy is not None:
+                    self._occupancy.pending_removal |= 1 << i
+                removed += 1
+        if removed:
+            self.generation += 1
+        return removed
@@ -0,0 +1,62 @@
+"""
+Per-tile damage-per-frame grid for one player's turrets.
+
+Built once from a BoardSnapshot, then kept in sync with add/remove
+calls as structures change. Damage along a path is a gather-and-sum over
+the path's flat indices instead of a get_attackers() scan per tile.
+"""
+from array import array
+
+from arena import ARENA_SIZE, NUM_TILES, ARENA_TILES, tiles_in_range
+
+
+class DamageMap:
+    def __init__(self, owner=1):
+        # owner is the player whose turrets are tracked, so owner=1 is the
+        # damage the enemy deals to our mobile units
+        self.owner = owner
+        self.grid = array('d', bytes(8 * NUM_TILES))
+        self.turrets = {}
+
+    @classmethod
+    def from_board(cls, board, owner=1):
+        damage_map = cls(owner)
+        for i in ARENA_TILES:
+            if board.owner[i] == owner:
+                damage_map.sync_tile(board, i)
+        return damage_map
+
+    def sync_tile(self, board, i):
+        """Bring tile i in line with the board after it changed."""
+        location = [i % ARENA_SIZE, i // ARENA_SIZE]
+        stats = board.stats_at(i) if board.owner[i] == self.owner else None
+        if stats is not None and stats.damage_i > 0:
+            self.add_turret(location, stats.damage_i, stats.attack_range)
+        else:
+            self.remove_turret(location)
+
+    def add_turret(self, location, damage, attack_range):
+        i = location[0] + ARENA_SIZE * location[1]
+        if i in self.turrets:
+            self.remove_turret(location)
+        self.turrets[i] = (damage, attack_range)
+        grid = self.grid
+        for j in tiles_in_range(i, attack_range):
+            grid[j] += damage
+
+    def remove_turret(self, location):
+        i = location[0] + ARENA_SIZE * location[1]
+        turret = self.turrets.pop(i, None)
+        if turret is None:
+            return
+        damage, attack_range = turret
+        grid = self.grid
+        for j in tiles_in_range(i, attack_range):
+            grid[j] -= damage
+
+    def damage_at(self, location):
+        return self.grid[location[0] + ARENA_SIZE * location[1]]
+
+    def path_damage(self, path):
+        grid = self.grid
+        return sum(grid[x + ARENA_SIZE * y] for x, y in path)
@@ -0,0 +1,111 @@
+"""
+Online model of when and from which side the enemy attacks.
+
+One record per turn goes into a fixed-size ring buffer: the enemy's MP at
+the start of the turn, the mobile units it then spawned on each side and
+the tiles it breached on.
+Attack timing is a logistic regression over a handful of features of that
+history, updated with one SGD step per turn when the previous turn's
+outcome becomes known. The spawn side is an exponentially decayed count of
+units per side. observe() and both queries are a few dozen float
+operations, well under a millisecond.
+"""
+from array import array
+from math import exp
+
+from arena import ARENA_SIZE, HALF_ARENA, TOP_LEFT, TOP_RIGHT
+
+NUM_FEATURES = 5
+
+
+class EnemyModel:
+    def __init__(self, window=32, learning_rate=0.3, side_decay=0.7):
+        self.window = window
+        self.learning_rate = learning_rate
+        self.side_decay = side_decay
+        self.mp = array('d', bytes(8 * window))
+        self.spawned_left = array('H', bytes(2 * window))
+        self.spawned_right = array('H', bytes(2 * window))
+        # Flat indices of the tiles breached, one entry per breach
+        self.breached = [()] * window
+        self.turns = 0
+        # Prior: attacks become likely as MP builds up, and once the enemy
+        # can afford what it sent last time
+        self.weights = [-2.5, 0.6, 2.5, 0.0, 1.0]
+        self.side_weight = [0.0, 0.0]
+        self.last_attack_mp = 0.0
+        self.last_attack_turn = -1
+        self._features = None
+
+    def features(self, mp):
+        turns_since = self.turns - self.last_attack_turn if self.last_attack_turn >= 0 else self.turns
+        seen = min(self.turns, self.window)
+        attacks = sum(1 for k in range(seen) if self.spawned_left[k] or self.spawned_right[k])
+        return (1.0,
+                mp / 10,
+                1.0 if self.last_attack_turn >= 0 and mp >= 0.9 * self.last_attack_mp else 0.0,
+                min(turns_since, 10) / 10,
+                attacks / seen if seen else 0.0)
+
+    def observe(self, mp, spawns, breaches=()):
+        """
+        Called once at the start of each turn with the enemy's MP now, and
+        its mobile spawns (x, y, unit type) and breach tiles (x, y) from the
+        action phase just played.
+        """
+        if self._features is not None:
+            left = sum(1 for x, _, _ in spawns if x < HALF_ARENA)
+            right = len(spawns) - left
+            slot = (self.turns - 1) % self.window
+            self.spawned_left[slot] = left
+            self.spawned_right[slot] = right
+            self.breached[slot] = tuple(x + ARENA_SIZE * y for x, y in breaches)
+            attacked = 1.0 if spawns else 0.0
+            # One SGD step on the log loss of last turn's prediction
+            error = attacked - self._predict(self._features)
+            rate = self.learning_rate
+            self.weights = [w + rate * error * f for w, f in zip(self.weights, self._features)]
+            decay = self.side_decay
+            self.side_weight = [self.side_weight[0] * decay + left, self.side_weight[1] * decay + right]
+            if spawns:
+                self.last_attack_mp = self.mp[slot]
+                self.last_attack_turn = self.turns - 1
+
+        slot = self.turns % self.window
+        self.mp[slot] = mp
+        self.spawned_left[slot] = self.spawned_right[slot] = 0
+        self.breached[slot] = ()
+        self._features = self.features(mp)
+        self.turns += 1
+
+    def _predict(self, features):
+        z = sum(w * f for w, f in zip(self.weights, features))
+        if z < -30:
+            return 0.0
+        return 1 / (1 + exp(-z))
+
+    def attack_probability(self):
+        """Probability the enemy deploys mobile units this turn."""
+        if self._features is None:
+            return 0.0
+        return self._predict(self._features)
+
+    def recent_breaches(self, turns=None):
+        """{(x, y): breaches} over the last turns recorded, the whole window by default."""
+        counts = {}
+        # The newest slot is the turn being played, so window - 1 are complete
+        limit = self.window - 1 if turns is None else min(turns, self.window - 1)
+        for back in range(1, min(self.turns - 1, limit) + 1):
+            for i in self.breached[(self.turns - 1 - back) % self.window]:
+                location = (i % ARENA_SIZE, i // ARENA_SIZE)
+                counts[location] = counts.get(location, 0) + 1
+        return counts
+
+    def likely_side(self):
+        """(edge the enemy most likely spawns from, share of recent units from it)."""
+        left, right = self.side_weight
+        if left + right == 0:
+            return None, 0.0
+        if left >= right:
+            return TOP_LEFT, left / (left + right)
+        return TOP_RIGHT, right / (left + right)
@@ -0,0 +1,82 @@
+"""
+Cross-turn state that is updated from board diffs instead of rebuilt.
+
+gamelib still needs a fresh GameState every turn to queue commands, but the
+data derived from it does not have to start over: most turns only change a
+handful of tiles, so each new snapshot is diffed against the previous one
+and only the changed tiles are pushed into the damage maps, while path
+distance fields are reused whenever the blocked layout is unchanged.
+"""
+from collections import namedtuple
+
+from arena import ARENA_TILES
+from board import BoardSnapshot, EMPTY
+from damage_map import DamageMap
+from pathing import PathCache, PathFinder
+
+# Flat tile indices in each category
+BoardDiff = namedtuple('BoardDiff', ['added', 'removed', 'damaged', 'upgraded'])
+
+
+def diff_boards(previous, current):
+    added, removed, damaged, upgraded = [], [], [], []
+    p_type, p_owner, p_health, p_upgraded = previous.unit_type, previous.owner, previous.health, previous.upgraded
+    c_type, c_owner, c_health, c_upgraded = current.unit_type, current.owner, current.health, current.upgraded
+    for i in ARENA_TILES:
+        before = p_type[i]
+        after = c_type[i]
+        if before == EMPTY and after == EMPTY:
+            continue
+        if before != after or p_owner[i] != c_owner[i]:
+            if before != EMPTY:
+                removed.append(i)
+            if after != EMPTY:
+                added.append(i)
+            continue
+        if c_upgraded[i] and not p_upgraded[i]:
+            upgraded.append(i)
+        if c_health[i] < p_health[i]:
+            damaged.append(i)
+    return BoardDiff(added, removed, damaged, upgraded)
+
+
+class IncrementalState:
+    def __init__(self, path_cache_size=4, finder=PathFinder):
+        self.board = None
+        # The board as the derived data last saw it; self.board itself is
+        # mutated by our own spawns during the turn
+        self.synced = None
+        self.diff = None
+        self.damage_maps = None
+        self.path_cache = PathCache(path_cache_size, finder)
+
+    def advance(self, game_state):
+        """
+        Snapshot the new turn, diff it against the last synced snapshot and
+        patch the derived data. Returns the new board.
+        """
+        board = BoardSnapshot.from_game_state(game_state)
+        if self.synced is None:
+            self.damage_maps = [DamageMap.from_board(board, 0), DamageMap.from_board(board, 1)]
+            self.diff = BoardDiff(list(ARENA_TILES), [], [], [])
+        else:
+            self.diff = diff_boards(self.synced, board)
+            for i in self.diff.added + self.diff.removed + self.diff.upgraded:
+                for damage_map in self.damage_maps:
+                    damage_map.sync_tile(board, i)
+        self.board = board
+        self.synced = board.copy()
+        return board
+
+    def resync(self):
+        """Push our own spawns and upgrades made since the last sync into the damage maps."""
+        if self.synced is None or self.synced.generation == self.board.generation:
+            return
+        diff = diff_boards(self.synced, self.board)
+        for i in diff.added + diff.removed + diff.upgraded:
+            for damage_map in self.damage_maps:
+                damage_map.sync_tile(self.board, i)
+        self.synced = self.board.copy()
+
+    def path_finder(self, blocked=None):
+        return self.path_cache.get(self.board.blocked() if blocked is None else blocked)
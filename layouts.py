@@ -0,0 +1,60 @@
+"""
+Layouts compiled once per game into immutable, indexed structures.
+
+Strategies describe their wall/turret/support plans as plain tuples of
+locations; compiling them in on_game_start gives each one a tuple for
+ordered iteration, a frozenset for membership, an index array for
+gathers against the board snapshot and a bitboard mask for set queries
+against the snapshot's bitboard.Occupancy, so nothing is rebuilt per turn.
+"""
+from array import array
+
+from arena import ARENA_SIZE
+from bitboard import mask_of
+
+
+class Layout:
+    __slots__ = ('name', 'locations', 'members', 'indices', 'mask', 'policies')
+
+    def __init__(self, name, locations, policies=()):
+        self.name = name
+        self.locations = tuple((x, y) for x, y in locations)
+        self.members = frozenset(self.locations)
+        self.indices = array('H', (x + ARENA_SIZE * y for x, y in self.locations))
+        self.mask = mask_of(self.locations)
+        self.policies = tuple(policies)
+
+    def __contains__(self, location):
+        return (location[0], location[1]) in self.members
+
+    def __iter__(self):
+        return iter(self.locations)
+
+    def __len__(self):
+        return len(self.locations)
+
+    def __repr__(self):
+        return 'Layout({!r}, {} tiles)'.format(self.name, len(self.locations))
+
+
+class LayoutRegistry:
+    """
+    Named layouts for one strategy. Turn-dependent variants are registered
+    under their own key, e.g. ('turrets', phase), and picked per turn.
+    """
+    def __init__(self):
+        self._layouts = {}
+
+    def add(self, name, locations, policies=()):
+        layout = Layout(name, locations, policies)
+        self._layouts[name] = layout
+        return layout
+
+    def __getitem__(self, name):
+        return self._layouts[name]
+
+    def __contains__(self, name):
+        return name in self._layouts
+
+    def names(self):
+        return list(self._layouts)
@@ -0,0 +1,374 @@
+"""
+Local approximation of the game rules for offline matches between algos.
+
+Two AlgoStrategy instances receive turn-state strings built from a shared
+absolute board (player 1 sees it rotated 180 degrees, as the engine shows
+it), their captured build/deploy commands are applied and the action phase
+is stepped frame by frame: support shields, movement along gamelib-style
+shortest paths with rerouting when structures fall, simultaneous targeting
+that prefers mobile units, then the nearest and weakest target, breaches and
+self destructs. Resource growth and decay follow the config.
+
+It is close enough to rank strategies and tune thresholds against each
+other, not to reproduce official replays frame for frame.
+"""
+import json
+from collections import namedtuple
+
+from arena import ARENA_SIZE, HALF_ARENA, ARENA_TILES, EDGES, TOP_RIGHT, TOP_LEFT, BOTTOM_LEFT, BOTTOM_RIGHT, tiles_in_range
+from board import BoardSnapshot, EMPTY
+from pathing import PathFinder
+from unit_stats import unit_stats
+
+MatchResult = namedtuple('MatchResult', ['winner', 'turns', 'health', 'error'])
+
+MAX_FRAMES = 1000
+STRUCTURES = (0, 1, 2)
+HALVES = (frozenset(i for i in ARENA_TILES if i // ARENA_SIZE < HALF_ARENA),
+          frozenset(i for i in ARENA_TILES if i // ARENA_SIZE >= HALF_ARENA))
+
+
+def flip(x, y):
+    return ARENA_SIZE - 1 - x, ARENA_SIZE - 1 - y
+
+
+def own_edges(player):
+    return (BOTTOM_LEFT, BOTTOM_RIGHT) if player == 0 else (TOP_LEFT, TOP_RIGHT)
+
+
+def target_edge(player, x, y):
+    if player == 0:
+        return TOP_RIGHT if x < HALF_ARENA else TOP_LEFT
+    return BOTTOM_RIGHT if x < HALF_ARENA else BOTTOM_LEFT
+
+
+class Match:
+    def __init__(self, config, algos, capture, max_turns=100):
+        """
+        algos are two AlgoStrategy instances. capture(algo, turn_string)
+        runs algo.on_turn and returns its (build, deploy) command lists.
+        """
+        self.config = config
+        self.info = config["unitInformation"]
+        self.stats = unit_stats(config)
+        self.resources = config.get("resources", {})
+        self.algos = algos
+        self.capture = capture
+        self.max_turns = max_turns
+        self.board = BoardSnapshot(config)
+        self.health = [float(self.resources.get("startingHP", 30))] * 2
+        self.sp = [float(self.resources.get("startingCores", 40))] * 2
+        self.mp = [float(self.resources.get("startingBits", 5))] * 2
+        self.turn = 0
+        self.breaches = []
+        self.units = []
+        self._edge_tiles = [frozenset(x + ARENA_SIZE * y for edge in own_edges(p) for x, y in EDGES[edge]) for p in (0, 1)]
+
+    # Turn state serialization
+
+    def unit_lists(self, player):
+        """p1Units and p2Units for the player, each a list per unit type."""
+        board = self.board
+        units = [[], []]
+        for owner in (0, 1):
+            lists = [[] for _ in range(len(self.info))]
+            for i in ARENA_TILES:
+                if board.owner[i] != owner:
+                    continue
+                x, y = i % ARENA_SIZE, i // ARENA_SIZE
+                if player == 1:
+                    x, y = flip(x, y)
+                lists[board.unit_type[i]].append([x, y, board.health[i], str(i)])
+                if board.pending_removal[i]:
+                    lists[6].append([x, y, 0, str(i)])
+                if board.upgraded[i]:
+                    lists[7].append([x, y, 0, str(i)])
+            units[owner] = lists
+        return units[player], units[1 - player]
+
+    def turn_string(self, player):
+        mine, theirs = self.unit_lists(player)
+        me, them = player, 1 - player
+        return json.dumps({
+            "turnInfo": [0, self.turn, -1, 0],
+            "p1Stats": [self.health[me], self.sp[me], self.mp[me], 0],
+            "p2Stats": [self.health[them], self.sp[them], self.mp[them], 0],
+            "p1Units": mine,
+            "p2Units": theirs,
+            "events": {},
+        })
+
+    def frame_string(self, player, units):
+        """
+        One summary action frame per turn: the structures left after the
+        action phase, and its spawn and breach events.
+        """
+        spawns = []
+        for unit_type, owner, i in units:
+            x, y = i % ARENA_SIZE, i // ARENA_SIZE
+            if player == 1:
+                x, y = flip(x, y)
+            spawns.append([[x, y], unit_type, "", 1 if owner == player else 2])
+        breaches = []
+        for i, unit_type, owner in self.breaches:
+            x, y = i % ARENA_SIZE, i // ARENA_SIZE
+            if player == 1:
+                x, y = flip(x, y)
+            breaches.append([[x, y], 1, unit_type, "", 1 if owner == player else 2])
+        mine, theirs = self.unit_lists(player)
+        return json.dumps({"turnInfo": [1, self.turn, 0, 0], "p1Units": mine, "p2Units": theirs,
+                           "events": {"spawn": spawns, "breach": breaches}})
+
+    # Build and deploy
+
+    def apply_build(self, player, build):
+        board = self.board
+        for shorthand, x, y in build:
+            if player == 1:
+                x, y = flip(x, y)
+            i = x + ARENA_SIZE * y
+            if i not in HALVES[player]:
+                continue
+            t = board.type_index.get(shorthand)
+            if t == 6:
+                if board.owner[i] == player:
+                    board.pending_removal[i] = 1
+            elif t == 7:
+                if board.owner[i] == player and not board.upgraded[i]:
+                    unit_type = board.unit_type[i]
+                    cost = self.stats.get(unit_type, True).cost_sp
+                    if cost <= self.sp[player]:
+                        self.sp[player] -= cost
+                        board.upgraded[i] = 1
+                        board.health[i] += self.stats.get(unit_type, True).health - self.stats.get(unit_type).health
+            elif t in STRUCTURES and board.unit_type[i] == EMPTY:
+                cost = self.stats.get(t).cost_sp
+                if cost <= self.sp[player]:
+                    self.sp[player] -= cost
+                    board.unit_type[i] = t
+                    board.owner[i] = player
+                    board.health[i] = self.stats.get(t).health
+                    board.upgraded[i] = 0
+                    board.pending_removal[i] = 0
+
+    def deploy(self, player, deploy, units):
+        board = self.board
+        for shorthand, x, y in deploy:
+            if player == 1:
+                x, y = flip(x, y)
+            i = x + ARENA_SIZE * y
+            t = board.type_index.get(shorthand)
+            if t is None or t in STRUCTURES or t > 5 or i not in self._edge_tiles[player] or board.unit_type[i] != EMPTY:
+                continue
+            cost = self.stats.get(t).cost_mp
+            if cost > self.mp[player]:
+                continue
+            self.mp[player] -= cost
+            units.append(_Unit(self, t, player, x, y))
+
+    # Action phase
+
+    def action_phase(self, units):
+        board = self.board
+        self.units = units
+        path_finder = PathFinder(board.blocked())
+        for unit in units:
+            unit.route(path_finder)
+        supports = []
+        for i in ARENA_TILES:
+            stats = board.stats_at(i) if board.unit_type[i] != EMPTY else None
+            if stats is not None and stats.shield > 0:
+                row = i // ARENA_SIZE if board.owner[i] == 0 else ARENA_SIZE - 1 - i // ARENA_SIZE
+                supports.append((i, board.owner[i], frozenset(tiles_in_range(i, stats.shield_range)), stats.shield + stats.shield_bonus_y * row))
+
+        frame = 0
+        while units and frame < MAX_FRAMES:
+            frame += 1
+            for i, owner, cover, amount in supports:
+                if board.unit_type[i] == EMPTY:
+                    continue
+                for unit in units:
+                    if unit.owner == owner and unit.tile in cover and i not in unit.shielded:
+                        unit.shielded.add(i)
+                        unit.health += amount
+
+            for unit in units:
+                unit.move(self)
+
+            self.attack(units)
+
+            destroyed = False
+            for i in ARENA_TILES:
+                if board.unit_type[i] != EMPTY and board.health[i] <= 0:
+                    board.unit_type[i] = EMPTY
+                    board.owner[i] = EMPTY
+                    destroyed = True
+            units[:] = [unit for unit in units if unit.health > 0 and not unit.done]
+            if destroyed:
+                path_finder = PathFinder(board.blocked())
+                for unit in units:
+                    unit.route(path_finder)
+
+    def attack(self, units):
+        board = self.board
+        by_tile = {}
+        for unit in units:
+            by_tile.setdefault(unit.tile, []).append(unit)
+
+        hits = []
+        # Structures with a walker attack only shoot mobile units
+        for i in ARENA_TILES:
+            if board.unit_type[i] == EMPTY:
+                continue
+            stats = board.stats_at(i)
+            if stats.damage_i <= 0:
+                continue
+            target = self._nearest_unit(i, stats.attack_range, 1 - board.owner[i], by_tile)
+            if target is not None:
+                hits.append((target, stats.damage_i))
+        for unit in units:
+            target = self._nearest_unit(unit.tile, unit.attack_range, 1 - unit.owner, by_tile)
+            if target is not None:
+                hits.append((target, unit.damage_i))
+                continue
+            if unit.damage_f > 0:
+                structure = self._nearest_structure(unit.tile, unit.attack_range, 1 - unit.owner)
+                if structure is not None:
+                    board.health[structure] -= unit.damage_f
+        for target, damage in hits:
+            target.health -= damage
+
+    def _nearest_unit(self, tile, attack_range, owner, by_tile):
+        best = None
+        best_key = None
+        x, y = tile % ARENA_SIZE, tile // ARENA_SIZE
+        for j in tiles_in_range(tile, attack_range):
+            for unit in by_tile.get(j, ()):
+                if unit.owner != owner or unit.health <= 0:
+                    continue
+                key = ((j % ARENA_SIZE - x) ** 2 + (j // ARENA_SIZE - y) ** 2, unit.health)
+                if best_key is None or key < best_key:
+                    best, best_key = unit, key
+        return best
+
+    def _nearest_structure(self, tile, attack_range, owner):
+        board = self.board
+        best = None
+        best_key = None
+        x, y = tile % ARENA_SIZE, tile // ARENA_SIZE
+        for j in tiles_in_range(tile, attack_range):
+            if board.owner[j] == owner and board.health[j] > 0:
+                key = ((j % ARENA_SIZE - x) ** 2 + (j // ARENA_SIZE - y) ** 2, board.health[j])
+                if best_key is None or key < best_key:
+                    best, best_key = j, key
+        return best
+
+    def breach(self, unit):
+        self.breaches.append((unit.tile, unit.unit_type, unit.owner))
+        self.health[1 - unit.owner] -= self.stats.get(unit.unit_type).breach_damage
+        self.sp[unit.owner] += self.resources.get("coresForPlayerDamage", 0)
+
+    def self_destruct(self, unit):
+        board = self.board
+        stats = self.stats.get(unit.unit_type)
+        tiles = tiles_in_range(unit.tile, stats.self_destruct_range)
+        for j in tiles:
+            if board.owner[j] == 1 - unit.owner:
+                board.health[j] -= stats.self_destruct_f
+        for other in self.units:
+            if other.owner != unit.owner and other.tile in tiles:
+                other.health -= stats.self_destruct_i
+
+    # Turn bookkeeping
+
+    def end_turn(self):
+        board = self.board
+        for i in ARENA_TILES:
+            if board.unit_type[i] != EMPTY and board.pending_removal[i]:
+                unit_type = board.unit_type[i]
+                upgraded = board.upgraded[i]
+                stats = self.stats.get(unit_type, upgraded)
+                cost = self.stats.get(unit_type).cost_sp + (stats.cost_sp if upgraded else 0)
+                self.sp[board.owner[i]] += cost * stats.refund * board.health[i] / stats.health if stats.health else 0
+                board.unit_type[i] = EMPTY
+                board.owner[i] = EMPTY
+                board.pending_removal[i] = 0
+        self.turn += 1
+        growth = self.resources.get("bitGrowthRate", 1) * (self.turn // self.resources.get("turnIntervalForBitSchedule", 10))
+        for player in (0, 1):
+            self.sp[player] += self.resources.get("coresPerRound", 5)
+            self.mp[player] = round(self.mp[player] * (1 - self.resources.get("bitDecayPerRound", 0.25))
+                                    + self.resources.get("bitsPerRound", 5) + growth, 1)
+
+    def play(self):
+        for algo in self.algos:
+            algo.on_game_start(self.config)
+        while self.turn < self.max_turns and min(self.health) > 0:
+            commands = []
+            for player, algo in enumerate(self.algos):
+                try:
+                    commands.append(self.capture(algo, self.turn_string(player)))
+                except Exception as error:
+                    # A crashing algo forfeits
+                    return MatchResult(1 - player, self.turn, tuple(self.health), '{}: {}'.format(type(error).__name__, error))
+            for player, (build, _) in enumerate(commands):
+                self.apply_build(player, build)
+            units = []
+            for player, (_, deploy) in enumerate(commands):
+                self.deploy(player, deploy, units)
+            del self.breaches[:]
+            spawned = [(unit.unit_type, unit.owner, unit.tile) for unit in units]
+            self.action_phase(units)
+            for player, algo in enumerate(self.algos):
+                algo.on_action_frame(self.frame_string(player, spawned))
+            self.end_turn()
+        if self.health[0] == self.health[1]:
+            winner = None
+        else:
+            winner = 0 if self.health[0] > self.health[1] else 1
+        return MatchResult(winner, self.turn, tuple(self.health), None)
+
+
+class _Unit:
+    __slots__ = ('unit_type', 'owner', 'tile', 'health', 'speed', 'damage_f', 'damage_i', 'attack_range',
+                 'path', 'step', 'progress', 'moved', 'edge', 'done', 'shielded', 'self_destruct_steps')
+
+    def __init__(self, match, unit_type, owner, x, y):
+        self.unit_type = unit_type
+        self.owner = owner
+        self.tile = x + ARENA_SIZE * y
+        stats = match.stats.get(unit_type)
+        self.health = stats.health
+        self.speed = stats.speed
+        self.damage_f = stats.damage_f
+        self.damage_i = stats.damage_i
+        self.attack_range = stats.attack_range
+        self.self_destruct_steps = stats.self_destruct_steps
+        self.edge = target_edge(owner, x, y)
+        self.path = ()
+        self.step = 0
+        self.progress = 0.0
+        self.moved = 0
+        self.done = False
+        self.shielded = set()
+
+    def route(self, path_finder):
+        path = path_finder.path_to_edge([self.tile % ARENA_SIZE, self.tile // ARENA_SIZE], self.edge)
+        self.path = tuple(x + ARENA_SIZE * y for x, y in path) if path else (self.tile,)
+        self.step = 0
+
+    def move(self, match):
+        self.progress += self.speed
+        while self.progress >= 1 and not self.done:
+            self.progress -= 1
+            if self.step < len(self.path) - 1:
+                self.step += 1
+                self.moved += 1
+                self.tile = self.path[self.step]
+                continue
+            x, y = self.tile % ARENA_SIZE, self.tile // ARENA_SIZE
+            if (x, y) in EDGES[self.edge]:
+                match.breach(self)
+            elif self.moved >= self.self_destruct_steps:
+                match.self_destruct(self)
+            self.done = True
@@ -0,0 +1,217 @@
+"""
+Streams replay files into columnar tables for offline analysis.
+
+A replay is the engine's line format: the config line, then turn-state lines
+(turnInfo[0] == 0) and action-frame lines (turnInfo[0] == 1). parse_replay()
+is a generator over one file that yields (table, row) pairs line by line;
+action frames only have their event lists decoded. ingest() feeds those rows
+into a Dataset directory where every column is a flat binary file of one
+array typecode, appended in fixed-size chunks, so memory stays flat however
+many replays go in; only the rows of the replay being parsed are held.
+Reading a column maps the file and casts it to a memoryview without copying.
+
+    python log_ingest.py ingest dataset/ replays/*.replay
+    python log_ingest.py summary dataset/
+"""
+import argparse
+import glob
+import json
+import mmap
+import os
+import sys
+from array import array
+
+from action_frames import decode_after
+
+MOBILE_TYPES = (3, 4, 5)
+
+# table -> ((column, array typecode), ...)
+SCHEMA = {
+    'turns': (('replay', 'I'), ('turn', 'H'),
+              ('p1_health', 'f'), ('p1_sp', 'f'), ('p1_mp', 'f'), ('p1_structures', 'H'),
+              ('p2_health', 'f'), ('p2_sp', 'f'), ('p2_mp', 'f'), ('p2_structures', 'H')),
+    'structures': (('replay', 'I'), ('turn', 'H'), ('player', 'B'), ('unit_type', 'B'),
+                   ('x', 'B'), ('y', 'B'), ('health', 'f'), ('upgraded', 'B')),
+    'spawns': (('replay', 'I'), ('turn', 'H'), ('frame', 'H'), ('player', 'B'), ('unit_type', 'B'), ('x', 'B'), ('y', 'B')),
+    'breaches': (('replay', 'I'), ('turn', 'H'), ('frame', 'H'), ('player', 'B'), ('unit_type', 'B'), ('x', 'B'), ('y', 'B'), ('damage', 'f')),
+    'damage': (('replay', 'I'), ('turn', 'H'), ('frame', 'H'), ('player', 'B'), ('unit_type', 'B'), ('x', 'B'), ('y', 'B'), ('amount', 'f')),
+}
+
+
+def parse_replay(path, replay_id):
+    """Yields (table, row) for one replay file, one line at a time."""
+    with open(path) as replay:
+        for line in replay:
+            if '"turnInfo"' not in line:
+                continue
+            turn_info = decode_after(line, '"turnInfo":')
+            phase, turn, frame = turn_info[0], turn_info[1], turn_info[2]
+            if phase == 0:
+                state = json.loads(line)
+                counts = []
+                for player, key in ((1, 'p1Units'), (2, 'p2Units')):
+                    units = state[key]
+                    upgraded = {(x, y) for x, y, *_ in units[7]} if len(units) > 7 else set()
+                    count = 0
+                    for unit_type in (0, 1, 2):
+                        for x, y, health, *_ in units[unit_type]:
+                            count += 1
+                            yield 'structures', (replay_id, turn, player, unit_type, x, y, health, (x, y) in upgraded)
+                    counts.append(count)
+                p1, p2 = state['p1Stats'], state['p2Stats']
+                yield 'turns', (replay_id, turn, p1[0], p1[1], p1[2], counts[0], p2[0], p2[1], p2[2], counts[1])
+            elif phase == 1:
+                events = line.find('"events":')
+                if events < 0:
+                    continue
+                for location, unit_type, _, player in decode_after(line, '"spawn":', events) or ():
+                    if unit_type in MOBILE_TYPES:
+                        yield 'spawns', (replay_id, turn, frame, player, unit_type, location[0], location[1])
+                for location, damage, unit_type, _, player in decode_after(line, '"breach":', events) or ():
+                    yield 'breaches', (replay_id, turn, frame, player, unit_type, location[0], location[1], damage)
+                for location, amount, unit_type, _, player in decode_after(line, '"damage":', events) or ():
+                    yield 'damage', (replay_id, turn, frame, player, unit_type, location[0], location[1], amount)
+
+
+class TableWriter:
+    def __init__(self, directory, columns, chunk_rows=65536):
+        self.directory = directory
+        self.columns = columns
+        self.chunk_rows = chunk_rows
+        self._buffers = [array(typecode) for _, typecode in columns]
+        os.makedirs(directory, exist_ok=True)
+
+    def append(self, row):
+        for buffer, value in zip(self._buffers, row):
+            buffer.append(value)
+        if len(self._buffers[0]) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        for (name, _), buffer in zip(self.columns, self._buffers):
+            if buffer:
+                with open(os.path.join(self.directory, name + '.col'), 'ab') as column:
+                    buffer.tofile(column)
+                del buffer[:]
+
+
+class Table:
+    """Read-only memory-mapped columns of one table."""
+    def __init__(self, directory, columns):
+        self.directory = directory
+        self.typecodes = dict(columns)
+        self._maps = {}
+
+    def column(self, name):
+        if name not in self._maps:
+            path = os.path.join(self.directory, name + '.col')
+            if not os.path.exists(path) or os.path.getsize(path) == 0:
+                self._maps[name] = (None, memoryview(array(self.typecodes[name])))
+            else:
+                with open(path, 'rb') as column:
+                    mapped = mmap.mmap(column.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[name] = (mapped, memoryview(mapped).cast(self.typecodes[name]))
+        return self._maps[name][1]
+
+    def __getitem__(self, name):
+        return self.column(name)
+
+    def __len__(self):
+        return len(self.column(next(iter(self.typecodes))))
+
+    def close(self):
+        for mapped, view in self._maps.values():
+            view.release()
+            if mapped is not None:
+                mapped.close()
+        self._maps = {}
+
+
+class Dataset:
+    def __init__(self, directory):
+        self.directory = directory
+        manifest = os.path.join(directory, 'replays.json')
+        self.replays = []
+        if os.path.exists(manifest):
+            with open(manifest) as replays:
+                self.replays = json.load(replays)
+
+    def table(self, name):
+        return Table(os.path.join(self.directory, name), SCHEMA[name])
+
+    def ingest(self, paths, chunk_rows=65536):
+        """
+        Appends the replays not already in the dataset; returns how many were
+        added. A replay's rows are only written once the whole file has
+        parsed, so a replay that fails partway (e.g. a truncated last line)
+        is skipped without leaving rows under an id the manifest never gets.
+        """
+        writers = {name: TableWriter(os.path.join(self.directory, name), columns, chunk_rows) for name, columns in SCHEMA.items()}
+        known = set(self.replays)
+        added = 0
+        try:
+            for path in paths:
+                if path in known:
+                    continue
+                replay_id = len(self.replays)
+                try:
+                    rows = list(parse_replay(path, replay_id))
+                except (OSError, ValueError, KeyError, IndexError, TypeError) as error:
+                    print('skipped {}: {}: {}'.format(path, type(error).__name__, error), file=sys.stderr)
+                    continue
+                for table, row in rows:
+                    writers[table].append(row)
+                self.replays.append(path)
+                known.add(path)
+                added += 1
+        finally:
+            for writer in writers.values():
+                writer.flush()
+            with open(os.path.join(self.directory, 'replays.json'), 'w') as manifest:
+                json.dump(self.replays, manifest)
+        return added
+
+
+def attack_turns(dataset, player=1):
+    """{(replay, turn): (units spawned, breaches scored)} for turns the player attacked."""
+    spawns = dataset.table('spawns')
+    breaches = dataset.table('breaches')
+    attacks = {}
+    for replay, turn, who in zip(spawns['replay'], spawns['turn'], spawns['player']):
+        if who == player:
+            spawned, scored = attacks.get((replay, turn), (0, 0))
+            attacks[(replay, turn)] = (spawned + 1, scored)
+    for replay, turn, who in zip(breaches['replay'], breaches['turn'], breaches['player']):
+        if who == player and (replay, turn) in attacks:
+            spawned, scored = attacks[(replay, turn)]
+            attacks[(replay, turn)] = (spawned, scored + 1)
+    return attacks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest = commands.add_parser('ingest')
+    ingest.add_argument('dataset')
+    ingest.add_argument('replays', nargs='+')
+    summary = commands.add_parser('summary')
+    summary.add_argument('dataset')
+    args = parser.parse_args(argv)
+
+    dataset = Dataset(args.dataset)
+    if args.command == 'ingest':
+        paths = [path for pattern in args.replays for path in sorted(glob.glob(pattern)) or [pattern]]
+        print('ingested {} replays'.format(dataset.ingest(paths)), file=sys.stderr)
+        return
+
+    print('{} replays'.format(len(dataset.replays)))
+    for name in SCHEMA:
+        print('{:<12}{:>10} rows'.format(name, len(dataset.table(name))))
+    attacks = attack_turns(dataset)
+    if attacks:
+        scoring = sum(1 for _, scored in attacks.values() if scored)
+        print('p1 attacked on {} turns, {:.0%} of them scored'.format(len(attacks), scoring / len(attacks)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Declarative repair/remove/upgrade planning for a defensive layout.
+
+A layout is a sequence of TilePolicy rows. policy_actions checks every row
+against the BoardSnapshot in one pass and reports which tiles are missing
+their structure, which should be removed and which may be upgraded, without
+spending anything. ActionPlanner (action_planner.py) then fits those
+actions into the SP budget together with the rest of the turn.
+"""
+from collections import namedtuple
+
+from arena import ARENA_SIZE
+from board import EMPTY
+
+# remove_below / remove_below_upgraded: remove our unit under this health
+# upgrade_priority: lower upgrades first, None never upgrades
+# upgrade_turn: earliest turn the tile may be upgraded
+TilePolicy = namedtuple('TilePolicy', ['location', 'unit_type', 'remove_below', 'remove_below_upgraded', 'upgrade_priority', 'upgrade_turn'])
+
+
+def tile_policies(locations, unit_type, remove_below=0, remove_below_upgraded=None, upgrade_priority=None, upgrade_turn=0):
+    if remove_below_upgraded is None:
+        remove_below_upgraded = remove_below
+    return tuple(TilePolicy(location, unit_type, remove_below, remove_below_upgraded, upgrade_priority, upgrade_turn)
+                 for location in locations)
+
+
+def policy_actions(board, policies, turn_number, upgrade=True):
+    """
+    Checks every policy against the board without spending anything.
+    Returns (policies whose tile is empty, in order; locations to remove;
+    upgrade candidates as (priority, order, location, cost), best first).
+    """
+    upgraded = board.stats.levels[1]
+    types, owners, health, flags, pending = board.unit_type, board.owner, board.health, board.upgraded, board.pending_removal
+    missing = []
+    removals = []
+    candidates = []
+    for order, policy in enumerate(policies):
+        x, y = policy.location
+        i = x + ARENA_SIZE * y
+        t = board.type_index[policy.unit_type]
+        if types[i] == EMPTY:
+            missing.append(policy)
+            continue
+        if types[i] != t or owners[i] != 0 or pending[i]:
+            continue
+        threshold = policy.remove_below_upgraded if flags[i] else policy.remove_below
+        if health[i] < threshold:
+            removals.append(policy.location)
+        elif upgrade and not flags[i] and policy.upgrade_priority is not None and turn_number >= policy.upgrade_turn:
+            candidates.append((policy.upgrade_priority, order, policy.location, upgraded[t].cost_sp))
+    candidates.sort()
+    return missing, removals, candidates
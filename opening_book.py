@@ -0,0 +1,284 @@
+"""
+Opening book: the first turns' commands looked up instead of recomputed.
+
+The first few turns nearly always build the same funnel from the same
+position, yet the strategy plans them from scratch, and a turn search
+(turn_search.py) has the least time exactly there. The book maps a
+position to the build and deploy commands the live strategy sent from it.
+On a hit the turn replays those commands through the GameState. On a miss
+it plays live.
+
+A position is hashed from the turn's BoardSnapshot arrays rather than the
+engine's JSON. The snapshot is the same whatever order the engine listed
+the units in. The hash covers the turn number, both sides' structures with
+health, upgrade and removal flags, both players' resources and health, and
+whatever history the strategy passes in (v3 passes the enemy model's
+attack probability). A book is only valid for what it was built with, so it
+records a fingerprint of the StrategyParams, the config's unit stats and
+resources, and the source of the strategy module and every repo module it
+imports. A book whose fingerprint differs is ignored, so any code or config
+change simply turns the book off until it is rebuilt.
+
+The builder plays the strategy with the book disabled, through replay
+transcripts and self-play games on the local engine. It records the
+commands sent from every position up to max_turn. A position that was seen
+with two different sets of commands is dropped rather than guessed, which
+also keeps out turns that depend on timing or hidden state.
+
+    python opening_book.py --config game-configs.json --self-play v0,v1,v2 --rounds 2 replays/*.txt
+"""
+import hashlib
+import json
+import os
+import re
+import struct
+import sys
+
+BOOK_FORMAT = 1
+MAX_TURN = 5
+DEFAULT_PATH = 'opening_book.json'
+# Resources and player health are hashed rounded to this many decimals, so
+# float noise in the engine's decay does not split positions
+RESOURCE_DIGITS = 1
+_IMPORT = re.compile(r'^\s*(?:from|import)\s+(\w+)', re.MULTILINE)
+# path -> code_version, read once per process
+_versions = {}
+
+
+def position_key(game_state, board, history=()):
+    """Hex digest identifying the position a turn is played from."""
+    digest = hashlib.blake2b(digest_size=8)
+    numbers = [game_state.turn_number, game_state.my_health, game_state.enemy_health]
+    numbers += game_state.get_resources(0) + game_state.get_resources(1)
+    digest.update(struct.pack('<{}d'.format(len(numbers)), *(round(n, RESOURCE_DIGITS) for n in numbers)))
+    digest.update(board.unit_type.tobytes())
+    digest.update(board.owner.tobytes())
+    digest.update(board.health.tobytes())
+    digest.update(bytes(board.upgraded))
+    digest.update(bytes(board.pending_removal))
+    digest.update(repr(tuple(history)).encode())
+    return digest.hexdigest()
+
+
+def code_version(path):
+    """
+    Hash of a module's source and of every module in its directory that it
+    imports, directly or not. Imports are found by scanning the source, so
+    the result does not depend on what else the process has imported.
+    """
+    version = _versions.get(path)
+    if version is None:
+        directory = os.path.dirname(os.path.abspath(path))
+        sources = {}
+        pending = [os.path.splitext(os.path.basename(path))[0]]
+        while pending:
+            name = pending.pop()
+            module_path = os.path.join(directory, name + '.py')
+            if name in sources or not os.path.isfile(module_path):
+                continue
+            with open(module_path, 'rb') as module_file:
+                sources[name] = module_file.read()
+            pending.extend(_IMPORT.findall(sources[name].decode('utf-8', 'replace')))
+        digest = hashlib.blake2b(digest_size=8)
+        for name in sorted(sources):
+            digest.update(name.encode() + b'\0' + sources[name])
+        version = _versions[path] = digest.hexdigest()
+    return version
+
+
+def book_fingerprint(params, config, code):
+    """Fingerprint of the parameters, the config's unit stats and resources, and a code_version."""
+    rules = json.dumps([config.get("unitInformation"), config.get("resources")], sort_keys=True)
+    return hashlib.blake2b('\0'.join((repr(params), rules, code)).encode(), digest_size=8).hexdigest()
+
+
+class OpeningBook:
+    def __init__(self, fingerprint, entries=None):
+        self.fingerprint = fingerprint
+        # position_key -> (build, deploy) as submit_turn sent them
+        self.entries = {} if entries is None else entries
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load(cls, path):
+        """
+        The book saved at path, or None if there is none, it is from another
+        format or it cannot be read. The book is optional, so a damaged file
+        is noted and played without rather than stopping the algo.
+        """
+        try:
+            with open(path) as book_file:
+                data = json.load(book_file)
+            if data.get('format') != BOOK_FORMAT:
+                return None
+            return cls(data['fingerprint'], data['entries'])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, AttributeError) as error:
+            import gamelib
+            gamelib.debug_write('Opening book {} unreadable, ignoring it: {}: {}'.format(path, type(error).__name__, error))
+            return None
+
+    def save(self, path):
+        """Writes the book beside path and renames it over, so an interrupted save leaves the old book."""
+        partial = path + '.partial'
+        with open(partial, 'w') as book_file:
+            json.dump({'format': BOOK_FORMAT, 'fingerprint': self.fingerprint, 'entries': self.entries},
+                      book_file, sort_keys=True, separators=(',', ':'))
+        os.replace(partial, path)
+
+    def lookup(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def play_entry(game_state, entry):
+    """
+    Queues a book entry's commands on game_state in their recorded order.
+    Returns how many of them the GameState refused, which is 0 whenever
+    the position really matches.
+    """
+    info = game_state.config["unitInformation"]
+    remove, upgrade = info[6]["shorthand"], info[7]["shorthand"]
+    build, deploy = entry
+    refused = 0
+    for unit_type, x, y in build:
+        if unit_type == remove:
+            done = game_state.attempt_remove([x, y])
+        elif unit_type == upgrade:
+            done = game_state.attempt_upgrade([x, y])
+        else:
+            done = game_state.attempt_spawn(unit_type, [x, y])
+        refused += not done
+    for unit_type, x, y in deploy:
+        refused += not game_state.attempt_spawn(unit_type, [x, y])
+    return refused
+
+
+class BookBuilder:
+    def __init__(self):
+        self.fingerprint = None
+        self.entries = {}
+        self.counts = {}
+        self.conflicts = set()
+
+    def record(self, algo, build, deploy):
+        """Records the commands an algo just sent, if it keyed the position."""
+        key = getattr(algo, 'book_key', None)
+        if key is None or key in self.conflicts:
+            return
+        fingerprint = book_fingerprint(algo.params, algo.config, code_version(sys.modules[type(algo).__module__].__file__))
+        if self.fingerprint is None:
+            self.fingerprint = fingerprint
+        elif fingerprint != self.fingerprint:
+            raise ValueError('Book positions recorded with different strategy parameters, config or code')
+        entry = [[list(command) for command in build], [list(command) for command in deploy]]
+        known = self.entries.get(key)
+        if known is None:
+            self.entries[key] = entry
+            self.counts[key] = 1
+        elif known == entry:
+            self.counts[key] += 1
+        else:
+            del self.entries[key]
+            del self.counts[key]
+            self.conflicts.add(key)
+
+    def book(self, min_count=1):
+        """The positions seen at least min_count times with the same commands."""
+        entries = {key: entry for key, entry in self.entries.items() if self.counts[key] >= min_count}
+        return OpeningBook(self.fingerprint, entries)
+
+
+def _booking(module, max_turn):
+    """Makes a strategy module key positions up to max_turn and play every turn live."""
+    module.OPENING_BOOK = None
+    module.BOOK_TURNS = max_turn
+
+
+def record_transcripts(builder, version, paths, max_turn=MAX_TURN):
+    from replay import load_strategy, play_transcript
+    for path in paths:
+        algo, commands = load_strategy(version)
+        _booking(sys.modules[type(algo).__module__], max_turn)
+
+        def turn(turn_number, line):
+            if turn_number > max_turn:
+                return True
+            del commands[:]
+            algo.on_turn(line)
+            if len(commands) >= 2:
+                builder.record(algo, json.loads(commands[0]), json.loads(commands[1]))
+
+        play_transcript(algo, path, turn)
+
+
+def record_self_play(builder, version, opponents, config, rounds=1, max_turn=MAX_TURN):
+    """Plays the version from both sides against every opponent spec."""
+    import random
+    import zlib
+    from local_engine import Match
+    from tournament import build_algo, capture
+
+    def recording(algo, turn_string):
+        build, deploy = capture(algo, turn_string)
+        if algo is ours:
+            builder.record(algo, build, deploy)
+        return build, deploy
+
+    for round_number in range(rounds):
+        for opponent in opponents:
+            for side in (0, 1):
+                game_id = '{}:{}|{}|{}'.format(round_number, version, opponent, side)
+                random.seed(zlib.crc32(game_id.encode()))
+                ours = build_algo(version)
+                _booking(sys.modules[type(ours).__module__], max_turn)
+                algos = [ours, build_algo(opponent)]
+                if side:
+                    algos.reverse()
+                Match(config, algos, recording, max_turn + 1).play()
+
+
+def main(argv=None):
+    import argparse
+    import glob
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('replays', nargs='*', help='transcript files or globs played by the version')
+    parser.add_argument('--version', default='v3')
+    parser.add_argument('--config', help='game config, needed for self-play')
+    parser.add_argument('--self-play', default='', help='comma separated opponent specs as in tournament.py')
+    parser.add_argument('--rounds', type=int, default=1)
+    parser.add_argument('--max-turn', type=int, default=MAX_TURN)
+    parser.add_argument('--min-count', type=int, default=1)
+    parser.add_argument('--out', default=DEFAULT_PATH)
+    args = parser.parse_args(argv)
+
+    builder = BookBuilder()
+    paths = sorted({path for pattern in args.replays for path in glob.glob(pattern)})
+    record_transcripts(builder, args.version, paths, args.max_turn)
+    opponents = [spec for spec in args.self_play.split(',') if spec]
+    if opponents:
+        if not args.config:
+            parser.error('--self-play needs --config')
+        with open(args.config) as config_file:
+            config = json.load(config_file)
+        record_self_play(builder, args.version, opponents, config, args.rounds, args.max_turn)
+
+    book = builder.book(args.min_count)
+    if book.fingerprint is None:
+        parser.error('no positions recorded')
+    book.save(args.out)
+    print('{} positions written to {}, {} dropped as ambiguous, {} below --min-count'.format(
+        len(book), args.out, len(builder.conflicts), len(builder.entries) - len(book)))
+
+
+if __name__ == "__main__":
+    main()
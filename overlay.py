@@ -0,0 +1,156 @@
+"""
+Copy-on-write what-if layer over a BoardSnapshot.
+
+Hypothetical structure additions and removals are kept in a small dict of
+changed tiles; the snapshot, its damage maps and GameState are never
+touched. Damage queries read the shared damage map grid and correct it only
+for the changed tiles within range, and pathing goes through the shared
+PathCache, so evaluating a layout option costs one BFS per distinct blocked
+layout plus a few path walks. The overlay keeps the Zobrist hash of its
+layout as changes are made. Given a TranspositionTable, defense_value() is
+looked up under that hash, so a layout reached again by another set of
+changes, or again on a later turn, is not evaluated twice.
+"""
+from arena import ARENA_SIZE, EDGES, TOP_LEFT, TOP_RIGHT, tiles_in_range
+from board import EMPTY
+from pathing import get_target_edge
+from spawn_scoring import score_spawns
+from zobrist import structure_hash
+
+ENEMY_EDGE = EDGES[TOP_LEFT] + EDGES[TOP_RIGHT]
+
+
+class BoardOverlay:
+    def __init__(self, board, damage_maps, path_cache, table=None):
+        """damage_maps must be in sync with board when a table is shared across boards."""
+        self.board = board
+        self.damage_maps = damage_maps
+        self.path_cache = path_cache
+        self.table = table
+        # Flat index -> (unit type index, owner, upgraded), or None if removed
+        self.changes = {}
+        self.hash = board.zobrist()
+        self._deltas = {}
+
+    def add(self, location, unit_type, owner=0, upgraded=False):
+        t = self.board.type_index[unit_type] if isinstance(unit_type, str) else unit_type
+        self._set(location[0] + ARENA_SIZE * location[1], (t, owner, upgraded))
+        return self
+
+    def remove(self, location):
+        self._set(location[0] + ARENA_SIZE * location[1], None)
+        return self
+
+    def _set(self, i, structure):
+        self.hash ^= structure_hash(i, self.structure_at(i)) ^ structure_hash(i, structure)
+        self.changes[i] = structure
+        self._deltas.clear()
+
+    def with_changes(self):
+        """A sibling overlay starting from this one's changes."""
+        overlay = BoardOverlay(self.board, self.damage_maps, self.path_cache, self.table)
+        overlay.changes = dict(self.changes)
+        overlay.hash = self.hash
+        return overlay
+
+    def structure_at(self, i):
+        """(unit type index, owner, upgraded) on tile i, or None."""
+        if i in self.changes:
+            return self.changes[i]
+        board = self.board
+        if board.unit_type[i] == EMPTY:
+            return None
+        return board.unit_type[i], board.owner[i], bool(board.upgraded[i])
+
+    def blocked(self, owner=None):
+        """Pathing blocks with the changes applied, only owner's structures if given."""
+        if owner is None:
+            blocked = self.board.blocked()
+        else:
+            board_owner = self.board.owner
+            blocked = bytearray(o == owner for o in board_owner)
+        for i, structure in self.changes.items():
+            blocked[i] = structure is not None and (owner is None or structure[1] == owner)
+        return blocked
+
+    def path_finder(self, owner=None):
+        return self.path_cache.get(self.blocked(owner))
+
+    def _delta(self, owner):
+        """Flat index -> change in owner's turret damage there, from the changed tiles."""
+        delta = self._deltas.get(owner)
+        if delta is not None:
+            return delta
+        delta = self._deltas[owner] = {}
+        board = self.board
+        for j, structure in self.changes.items():
+            # Undo whatever the snapshot had on j, then apply the change
+            if board.unit_type[j] != EMPTY and board.owner[j] == owner:
+                stats = board.stats_at(j)
+                if stats.damage_i > 0:
+                    for k in tiles_in_range(j, stats.attack_range):
+                        delta[k] = delta.get(k, 0) - stats.damage_i
+            if structure is not None and structure[1] == owner:
+                stats = board.stats.get(structure[0], structure[2])
+                if stats.damage_i > 0:
+                    for k in tiles_in_range(j, stats.attack_range):
+                        delta[k] = delta.get(k, 0) + stats.damage_i
+        return delta
+
+    def damage_at(self, location, owner=1):
+        """Damage per frame owner's turrets deal to a mobile unit on location."""
+        i = location[0] + ARENA_SIZE * location[1]
+        return self.damage_maps[owner].grid[i] + self._delta(owner).get(i, 0)
+
+    def damage_view(self, owner=1):
+        return _OverlayDamage(self, owner)
+
+    def enemy_threat(self, spawns=ENEMY_EDGE):
+        """score_spawns for enemy spawns against our turrets, least defended breaching path first."""
+        return score_spawns(self.path_finder(), self.damage_view(0), spawns)
+
+    def defense_value(self, spawns=ENEMY_EDGE):
+        """
+        Damage our turrets deal along the enemy's most dangerous path: a
+        breaching one if any, else the one ending deepest in our half, the
+        least defended first. Infinity if no enemy spawn has a path.
+
+        Enemy structures are left out of the pathing: the enemy opens and
+        closes its own walls between turns, so only ours shape its route.
+        """
+        if self.table is not None:
+            return self.table.get(('defense_value', self.hash, spawns), lambda: self._defense_value(spawns))
+        return self._defense_value(spawns)
+
+    def _defense_value(self, spawns):
+        path_finder = self.path_finder(0)
+        damage = self.damage_view(0)
+        best = None
+        for spawn in spawns:
+            path = path_finder.path_to_edge(spawn)
+            if path is None:
+                continue
+            end = path[-1]
+            breach = (end[0], end[1]) in EDGES[get_target_edge(spawn)]
+            # Row only ranks routes that stop short; any breach is as bad as another
+            key = (not breach, 0 if breach else end[1], damage.path_damage(path))
+            if best is None or key < best:
+                best = key
+        return float('inf') if best is None else best[2]
+
+
+class _OverlayDamage:
+    """DamageMap-shaped view of an overlay for score_spawns."""
+    __slots__ = ('overlay', 'owner')
+
+    def __init__(self, overlay, owner):
+        self.overlay = overlay
+        self.owner = owner
+
+    def damage_at(self, location):
+        return self.overlay.damage_at(location, self.owner)
+
+    def path_damage(self, path):
+        grid = self.overlay.damage_maps[self.owner].grid
+        delta = self.overlay._delta(self.owner)
+        return sum(grid[x + ARENA_SIZE * y] + delta.get(x + ARENA_SIZE * y, 0) for x, y in path)
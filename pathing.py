@@ -0,0 +1,226 @@
+"""
+Flat-array reimplementation of gamelib's ShortestPathFinder.
+
+gamelib runs a fresh idealness search and BFS for every find_path_to_edge
+call. Here one reverse BFS distance field is computed per target edge and
+shared by every start tile that can reach that edge; start tiles walled off
+from their edge fall back to a field rooted at the most ideal tile of their
+connected region, again shared by every start in that region. Paths are
+walked with the same neighbour order and tie-breaking rules as gamelib, so
+they match find_path_to_edge tile for tile.
+"""
+from array import array
+from collections import deque
+
+from arena import ARENA_SIZE, HALF_ARENA, NUM_TILES, IN_ARENA, ARENA_TILES, EDGES, TOP_RIGHT, TOP_LEFT, BOTTOM_LEFT, BOTTOM_RIGHT
+
+HORIZONTAL = 1
+VERTICAL = 2
+
+# Neighbour offsets in gamelib's order: up, down, right, left
+_STEPS = (ARENA_SIZE, -ARENA_SIZE, 1, -1)
+
+
+def get_target_edge(start_location):
+    left = start_location[0] < HALF_ARENA
+    bottom = start_location[1] < HALF_ARENA
+    if left and bottom:
+        return TOP_RIGHT
+    elif left:
+        return BOTTOM_RIGHT
+    elif bottom:
+        return TOP_LEFT
+    return BOTTOM_LEFT
+
+
+def _neighbors(i):
+    x = i % ARENA_SIZE
+    found = []
+    if i + ARENA_SIZE < NUM_TILES and IN_ARENA[i + ARENA_SIZE]:
+        found.append(i + ARENA_SIZE)
+    if i >= ARENA_SIZE and IN_ARENA[i - ARENA_SIZE]:
+        found.append(i - ARENA_SIZE)
+    if x < ARENA_SIZE - 1 and IN_ARENA[i + 1]:
+        found.append(i + 1)
+    if x > 0 and IN_ARENA[i - 1]:
+        found.append(i - 1)
+    return tuple(found)
+
+
+# In-arena neighbours of every tile, built once at import instead of per
+# visit; the BFS and path walks index it tens of thousands of times a turn
+NEIGHBORS = tuple(_neighbors(i) for i in range(NUM_TILES))
+
+
+class PathFinder:
+    def __init__(self, blocked):
+        # blocked is a NUM_TILES bytearray, non-zero where a structure stands
+        self.blocked = blocked
+        self._edge_fields = {}
+        self._ideal_fields = {}
+        self._region = None
+
+    @classmethod
+    def from_game_state(cls, game_state):
+        blocked = bytearray(NUM_TILES)
+        game_map = game_state.game_map
+        for i in ARENA_TILES:
+            for unit in game_map[i % ARENA_SIZE, i // ARENA_SIZE]:
+                if unit.stationary:
+                    blocked[i] = 1
+        return cls(blocked)
+
+    def _bfs(self, sources):
+        blocked = self.blocked
+        neighbors = NEIGHBORS
+        dist = array('i', [-1]) * NUM_TILES
+        queue = deque()
+        for i in sources:
+            if not blocked[i] and dist[i] < 0:
+                dist[i] = 0
+                queue.append(i)
+        while queue:
+            i = queue.popleft()
+            d = dist[i] + 1
+            for j in neighbors[i]:
+                if dist[j] < 0 and not blocked[j]:
+                    dist[j] = d
+                    queue.append(j)
+        return dist
+
+    def edge_field(self, target_edge):
+        """BFS distance from every open tile to the target edge, -1 if unreachable."""
+        field = self._edge_fields.get(target_edge)
+        if field is None:
+            field = self._bfs(x + ARENA_SIZE * y for x, y in EDGES[target_edge])
+            self._edge_fields[target_edge] = field
+        return field
+
+    def _region_of(self, i):
+        if self._region is None:
+            self._region = array('i', [-1]) * NUM_TILES
+        region = self._region
+        if region[i] < 0:
+            blocked = self.blocked
+            neighbors = NEIGHBORS
+            region[i] = i
+            queue = deque([i])
+            while queue:
+                j = queue.popleft()
+                for k in neighbors[j]:
+                    if region[k] < 0 and not blocked[k]:
+                        region[k] = i
+                        queue.append(k)
+        return region[i]
+
+    def _ideal_field(self, start, target_edge):
+        region_id = self._region_of(start)
+        key = (target_edge, region_id)
+        field = self._ideal_fields.get(key)
+        if field is None:
+            # Deepest tile towards the target edge, as in gamelib's _get_idealness
+            up = target_edge in (TOP_RIGHT, TOP_LEFT)
+            right = target_edge in (TOP_RIGHT, BOTTOM_RIGHT)
+            region = self._region
+
+            def idealness(i):
+                x, y = i % ARENA_SIZE, i // ARENA_SIZE
+                return 28 * (y if up else 27 - y) + (x if right else 27 - x)
+            ideal = max((i for i in ARENA_TILES if region[i] == region_id), key=idealness)
+            field = self._bfs((ideal,))
+            self._ideal_fields[key] = field
+        return field
+
+    def field_for(self, start, target_edge):
+        """Distance field that gamelib would walk for this start tile."""
+        field = self.edge_field(target_edge)
+        if field[start] < 0:
+            field = self._ideal_field(start, target_edge)
+        return field
+
+    def path_to_edge(self, start_location, target_edge=None):
+        """Same result as GameState.find_path_to_edge, None if the start is blocked."""
+        start = start_location[0] + ARENA_SIZE * start_location[1]
+        if self.blocked[start]:
+            return None
+        if target_edge is None:
+            target_edge = get_target_edge(start_location)
+        field = self.field_for(start, target_edge)
+        return self._walk(start, field, target_edge)
+
+    def _walk(self, current, field, target_edge):
+        blocked = self.blocked
+        neighbors = NEIGHBORS
+        right = target_edge in (TOP_RIGHT, BOTTOM_RIGHT)
+        up = target_edge in (TOP_RIGHT, TOP_LEFT)
+        path = [[current % ARENA_SIZE, current // ARENA_SIZE]]
+        move_direction = 0
+        while field[current] != 0:
+            cx, cy = current % ARENA_SIZE, current // ARENA_SIZE
+            best = current
+            best_length = field[current]
+            for j in neighbors[current]:
+                if blocked[j]:
+                    continue
+                length = field[j]
+                if length > best_length:
+                    continue
+                if length == best_length and not _better_direction(cx, cy, j, best, move_direction, right, up):
+                    continue
+                best = j
+                best_length = length
+            move_direction = VERTICAL if best % ARENA_SIZE == cx else HORIZONTAL
+            current = best
+            path.append([current % ARENA_SIZE, current // ARENA_SIZE])
+        return path
+
+
+def _better_direction(px, py, new, prev_best, previous_move_direction, right, up):
+    nx, ny = new % ARENA_SIZE, new // ARENA_SIZE
+    bx, by = prev_best % ARENA_SIZE, prev_best // ARENA_SIZE
+    if previous_move_direction == HORIZONTAL and nx != bx:
+        return py != ny
+    if previous_move_direction == VERTICAL and ny != by:
+        return px != nx
+    if previous_move_direction == 0:
+        return py != ny
+    if ny == by:
+        return nx > bx if right else nx < bx
+    if nx == bx:
+        return ny > by if up else ny < by
+    return True
+
+
+class PathCache:
+    """
+    Keeps the PathFinders for the last few distinct blocked layouts, so
+    repeated queries against an unchanged board reuse their distance fields
+    instead of redoing the BFS. finder is the class built for a new layout,
+    PathFinder or anything with the same path_to_edge, e.g.
+    bitboard.BitPathFinder.
+    """
+    def __init__(self, size=4, finder=PathFinder):
+        self.size = size
+        self.finder = finder
+        self._finders = {}
+
+    def get(self, blocked):
+        key = bytes(blocked)
+        finder = self._finders.pop(key, None)
+        if finder is None:
+            finder = self.finder(bytearray(blocked))
+            if len(self._finders) >= self.size:
+                del self._finders[next(iter(self._finders))]
+        self._finders[key] = finder
+        return finder
+
+    def finders(self):
+        return tuple(self._finders.values())
+
+    def put(self, finder):
+        """Adopts a PathFinder built elsewhere, e.g. on the background worker."""
+        key = bytes(finder.blocked)
+        self._finders.pop(key, None)
+        if len(self._finders) >= self.size:
+            del self._finders[next(iter(self._finders))]
+        self._finders[key] = finder
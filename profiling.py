@@ -0,0 +1,190 @@
+"""
+Per-turn latency instrumentation and a soft turn-budget watchdog.
+
+Phases are timed with ``with profiler.phase(name):`` or the ``profiled``
+method decorator. When profiling is disabled phase() hands back one shared
+no-op context, so instrumented code costs an attribute lookup and an empty
+with-block. The deadline is tracked either way, so optional work can check
+remaining() and scale itself down late in a turn.
+
+Run as a script to time a strategy's startup in fresh interpreters, from
+launch through on_game_start and optionally its first turn:
+
+    python profiling.py config.json v2 v3 --turn-state replay.txt
+"""
+import json
+import time
+from functools import wraps
+
+# Imported only when allocations are traced: it drags in linecache and
+# tokenize, which is several ms of startup the engine counts against us
+tracemalloc = None
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    __slots__ = ('profiler', 'name', 'start', 'memory')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        if self.profiler.trace_allocations:
+            self.memory = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        allocated = tracemalloc.get_traced_memory()[0] - self.memory if self.profiler.trace_allocations else 0
+        stats = self.profiler.phases.get(self.name)
+        if stats is None:
+            self.profiler.phases[self.name] = [elapsed, 1, allocated]
+        else:
+            stats[0] += elapsed
+            stats[1] += 1
+            stats[2] += allocated
+        return False
+
+
+class TurnProfiler:
+    def __init__(self, enabled=False, budget=None, trace_allocations=False, sink=None, side_file=None):
+        """
+        budget is the soft per-turn deadline in seconds, sink a callable such
+        as gamelib.debug_write for the per-turn record and side_file a path
+        to append the records to as JSON lines.
+        """
+        self.enabled = enabled
+        self.budget = budget
+        self.trace_allocations = enabled and trace_allocations
+        self.sink = sink
+        self.side_file = side_file
+        self.turn = -1
+        self.turn_start = time.perf_counter()
+        self.phases = {}
+        if self.trace_allocations:
+            global tracemalloc
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    def start_turn(self, turn_number=-1):
+        self.turn = turn_number
+        self.phases = {}
+        self.turn_start = time.perf_counter()
+
+    def phase(self, name):
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name)
+
+    def elapsed(self):
+        return time.perf_counter() - self.turn_start
+
+    def remaining(self):
+        """Seconds left before the soft deadline, infinite without a budget."""
+        if self.budget is None:
+            return float('inf')
+        return self.budget - self.elapsed()
+
+    def can_afford(self, seconds):
+        return self.remaining() > seconds
+
+    def end_turn(self):
+        """Emit the compact record for this turn and return it."""
+        if not self.enabled:
+            return None
+        record = {
+            'turn': self.turn,
+            'ms': round(self.elapsed() * 1000, 2),
+            'phases': {name: [round(total * 1000, 2), calls, allocated] for name, (total, calls, allocated) in self.phases.items()},
+        }
+        if self.sink is not None:
+            self.sink('turn {turn} {ms}ms '.format(**record) + ' '.join(
+                '{}={}ms/{}'.format(name, ms, calls) for name, (ms, calls, _) in record['phases'].items()))
+        if self.side_file is not None:
+            with open(self.side_file, 'a') as side_file:
+                side_file.write(json.dumps(record) + '\n')
+        return record
+
+
+def profiled(name):
+    """Times a method under the given phase name using self.profiler."""
+    def decorate(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.profiler.phase(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# Runs in a fresh interpreter per sample; argv is the strategy module, the
+# config path and optionally a replay whose first turn state is played
+_STARTUP_SAMPLE = """
+import json, sys, time
+module = __import__(sys.argv[1])
+imported = time.perf_counter()
+module.gamelib.debug_write = lambda *args: None
+with open(sys.argv[2]) as config_file:
+    config = json.load(config_file)
+algo = module.AlgoStrategy()
+algo.on_game_start(config)
+started = time.perf_counter()
+cpu = time.process_time()
+turn = 0.0
+if len(sys.argv) > 3:
+    with open(sys.argv[3]) as replay:
+        state = next(line for line in replay if json.loads(line).get('turnInfo', [None])[0] == 0)
+    module.gamelib.game_state.send_command = lambda command: None
+    algo.on_turn(state)
+    turn = time.perf_counter() - started
+print(json.dumps([started - imported, cpu, turn]))
+"""
+
+
+def measure_startup(version, config_path, runs=7, turn_state=None):
+    """
+    Median seconds over fresh processes, as (game start after import, CPU
+    from launch to the end of on_game_start, first turn).
+    """
+    import os
+    import statistics
+    import subprocess
+    import sys
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (here, os.environ.get('PYTHONPATH')))))
+    args = [sys.executable, '-c', _STARTUP_SAMPLE, version, config_path] + ([turn_state] if turn_state else [])
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(args, env=env, cwd=here, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                check=True, universal_newlines=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return tuple(statistics.median(column) for column in zip(*samples))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Time strategy startup in fresh processes.')
+    parser.add_argument('config')
+    parser.add_argument('versions', nargs='+')
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--turn-state', help='replay whose first turn state is played after game start')
+    args = parser.parse_args()
+    print('{:<8}{:>12}{:>10}{:>12}'.format('algo', 'on start ms', 'cpu ms', 'turn 0 ms'))
+    for version in args.versions:
+        start, cpu, turn = measure_startup(version, args.config, args.runs, args.turn_state)
+        print('{:<8}{:>12.1f}{:>10.1f}{:>12.1f}'.format(version, start * 1000, cpu * 1000, turn * 1000))
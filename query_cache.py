@@ -0,0 +1,57 @@
+"""
+Per-turn memo for derived structure queries.
+
+Results are keyed by query name and arguments and live until the turn ends
+or the board's generation changes, which BoardSnapshot bumps on every
+spawn, upgrade or removal of ours that went through. Mobile deploys do not
+touch structures, so they leave the memo alone. Hit and miss counts are kept
+per turn and for the whole game. Only derived results (spawn scores,
+waves, turret choices) are worth a memo entry; a single-tile lookup is
+cheaper straight from the BoardSnapshot than through the dict.
+"""
+
+
+class QueryCache:
+    def __init__(self):
+        self.board = None
+        self.turn = -1
+        self.generation = -1
+        self._memo = {}
+        self.hits = 0
+        self.misses = 0
+        self.total_hits = 0
+        self.total_misses = 0
+
+    def begin_turn(self, turn, board):
+        self.board = board
+        self.turn = turn
+        self.generation = board.generation
+        self._memo.clear()
+        self.total_hits += self.hits
+        self.total_misses += self.misses
+        self.hits = self.misses = 0
+
+    def get(self, name, args, compute):
+        """Memoised compute() for (name, args), recomputed after the board changed."""
+        if self.board.generation != self.generation:
+            self.generation = self.board.generation
+            self._memo.clear()
+        key = (name, args)
+        try:
+            value = self._memo[key]
+        except KeyError:
+            self.misses += 1
+            value = self._memo[key] = compute()
+            return value
+        self.hits += 1
+        return value
+
+    def seed(self, name, args, value):
+        """Stores a value computed elsewhere for the current board, e.g. by the background worker."""
+        if self.board.generation != self.generation:
+            self.generation = self.board.generation
+            self._memo.clear()
+        self._memo[(name, args)] = value
+
+    def summary(self):
+        return 'queries: {} hits, {} misses this turn'.format(self.hits, self.misses)
@@ -0,0 +1,170 @@
+"""
+Offline replay harness for the strategy versions.
+
+A replay is a recorded engine transcript: the config line followed by the
+turn-state and action-frame lines exactly as the engine writes them to the
+algo's stdin. Each replay is driven through AlgoStrategy.on_game_start /
+on_turn / on_action_frame of the chosen version (v0.py - v3.py) with the real
+gamelib, and the build/deploy commands that submit_turn would have sent are
+captured instead of written to stdout. Replays run in a process pool.
+
+tracemalloc slows allocation-heavy turns several times over, so peak memory
+is only measured with --memory and timings from such runs are not comparable
+with plain ones.
+
+    python replay.py --versions v2,v3 --workers 8 replays/*.txt
+"""
+import argparse
+import glob
+import importlib
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+TurnRecord = namedtuple('TurnRecord', ['turn', 'ms', 'peak_kb', 'build', 'deploy'])
+ReplayResult = namedtuple('ReplayResult', ['version', 'path', 'turns', 'frames_ms', 'error'])
+
+
+def read_transcript(path):
+    with open(path) as transcript:
+        for line in transcript:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def load_strategy(version):
+    """Fresh AlgoStrategy from v0..v3 with engine I/O redirected."""
+    module = importlib.import_module(version)
+    gamelib = module.gamelib
+    commands = []
+    gamelib.game_state.send_command = commands.append
+    gamelib.debug_write = lambda *args: None
+    gamelib.util.debug_write = gamelib.debug_write
+    return module.AlgoStrategy(), commands
+
+
+def play_transcript(algo, path, on_turn, on_frame=None):
+    """
+    Feeds a transcript to algo the way the engine loop does: the config goes
+    to on_game_start, then each turn state to on_turn(turn_number, line) and
+    each action frame to on_frame(line), algo.on_action_frame by default.
+    The callbacks call the algo's handlers themselves so they can time or
+    record around them. Stops at the end-of-game state or when a callback
+    returns True.
+    """
+    if on_frame is None:
+        on_frame = algo.on_action_frame
+    for line in read_transcript(path):
+        # As in the engine loop, any line that is not a game state is the config
+        if "turnInfo" not in line:
+            algo.on_game_start(json.loads(line))
+            continue
+        state_type = json.loads(line)["turnInfo"]
+        if state_type[0] == 0:
+            stop = on_turn(state_type[1], line)
+        elif state_type[0] == 1:
+            stop = on_frame(line)
+        else:
+            break
+        if stop:
+            break
+
+
+def run_replay(version, path, trace_memory=False):
+    try:
+        algo, commands = load_strategy(version)
+        turns = []
+        frames_ms = 0.0
+
+        def turn(turn_number, line):
+            del commands[:]
+            if trace_memory:
+                tracemalloc.reset_peak()
+            start = time.perf_counter()
+            algo.on_turn(line)
+            elapsed = (time.perf_counter() - start) * 1000
+            peak = tracemalloc.get_traced_memory()[1] / 1024 if trace_memory else 0.0
+            build, deploy = (json.loads(command) for command in commands[:2]) if len(commands) >= 2 else ([], [])
+            turns.append(TurnRecord(turn_number, elapsed, peak, build, deploy))
+
+        def frame(line):
+            nonlocal frames_ms
+            start = time.perf_counter()
+            algo.on_action_frame(line)
+            frames_ms += (time.perf_counter() - start) * 1000
+
+        if trace_memory:
+            tracemalloc.start()
+        play_transcript(algo, path, turn, frame)
+        if trace_memory:
+            tracemalloc.stop()
+        return ReplayResult(version, path, turns, frames_ms, None)
+    except Exception as error:
+        return ReplayResult(version, path, [], 0.0, '{}: {}'.format(type(error).__name__, error))
+
+
+def run_all(versions, paths, workers=None, trace_memory=False):
+    jobs = [(version, path, trace_memory) for version in versions for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_replay, *zip(*jobs))) if jobs else []
+
+
+def summarize(results):
+    """Per-version timing table rows: (version, turns, mean ms, p95 ms, max ms, peak KB, errors)."""
+    rows = []
+    for version in sorted({result.version for result in results}):
+        mine = [result for result in results if result.version == version]
+        times = sorted(turn.ms for result in mine for turn in result.turns)
+        peaks = [turn.peak_kb for result in mine for turn in result.turns]
+        errors = sum(1 for result in mine if result.error)
+        if times:
+            p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+            rows.append((version, len(times), statistics.mean(times), p95, times[-1], max(peaks), errors))
+        else:
+            rows.append((version, 0, 0.0, 0.0, 0.0, 0.0, errors))
+    return rows
+
+
+def decision_changes(results, baseline, candidate):
+    """Turns where the candidate version submitted different commands from the baseline."""
+    by_key = {(result.version, result.path): result for result in results}
+    changes = []
+    for (version, path), base in by_key.items():
+        if version != baseline or (candidate, path) not in by_key:
+            continue
+        for before, after in zip(base.turns, by_key[(candidate, path)].turns):
+            if sorted(map(tuple, before.build)) != sorted(map(tuple, after.build)) or before.deploy != after.deploy:
+                changes.append((path, before.turn))
+    return changes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('replays', nargs='+', help='transcript files or globs')
+    parser.add_argument('--versions', default='v0,v1,v2,v3', help='comma separated strategy modules')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--memory', action='store_true', help='trace peak memory per turn (slows turns down)')
+    args = parser.parse_args(argv)
+
+    versions = args.versions.split(',')
+    paths = sorted({path for pattern in args.replays for path in glob.glob(pattern)})
+    results = run_all(versions, paths, args.workers, args.memory)
+
+    print('{:<8}{:>8}{:>10}{:>10}{:>10}{:>12}{:>8}'.format('version', 'turns', 'mean ms', 'p95 ms', 'max ms', 'peak KB', 'errors'))
+    for row in summarize(results):
+        print('{:<8}{:>8}{:>10.2f}{:>10.2f}{:>10.2f}{:>12.1f}{:>8}'.format(*row))
+    for result in results:
+        if result.error:
+            print('{} {}: {}'.format(result.version, result.path, result.error), file=sys.stderr)
+    for baseline, candidate in zip(versions, versions[1:]):
+        changes = decision_changes(results, baseline, candidate)
+        print('{} -> {}: {} turns with different commands'.format(baseline, candidate, len(changes)))
+
+
+if __name__ == "__main__":
+    main()
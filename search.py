@@ -0,0 +1,105 @@
+"""
+Successive-halving search over the strategy parameters.
+
+Candidates are the default StrategyParams plus random draws from
+strategy_params.SEARCH_SPACE. Each rung plays every surviving candidate
+against every opponent from both sides on the local engine, keeps the best
+1/eta of them and multiplies the game length by eta, so most candidates are
+discarded after short, cheap games and only the last few play full ones.
+A game scores 1/0.5/0 for a win/draw/loss, and the health difference at the
+end breaks ties between truncated games.
+
+    python search.py --config game-configs.json --candidates 27 --opponents v1,v2,v3 --workers 8
+"""
+import argparse
+import random
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from strategy_params import StrategyParams, sample_params
+from tournament import Game, play_batch, score
+
+HEALTH_WEIGHT = 0.01
+
+
+def candidate_spec(version, params):
+    changes = params.changes()
+    if not changes:
+        return version
+    return '{}:{}'.format(version, ','.join('{}={}'.format(name, value) for name, value in sorted(changes.items())))
+
+
+def fitness(results, spec):
+    total = 0.0
+    games = 0
+    for result in results:
+        for side in (0, 1):
+            if result['entrants'][side] == spec:
+                total += score(result, side) + HEALTH_WEIGHT * (result['health'][side] - result['health'][1 - side])
+                games += 1
+    return total / games if games else 0.0
+
+
+def play_rung(pool, config_path, specs, opponents, max_turns, batch_size):
+    games = []
+    for spec in specs:
+        for opponent in opponents:
+            for entrants in ((spec, opponent), (opponent, spec)):
+                game_id = '{}:{}|{}'.format(max_turns, *entrants)
+                games.append(Game(game_id, entrants, zlib.crc32(game_id.encode())))
+    batches = [games[i:i + batch_size] for i in range(0, len(games), batch_size)]
+    results = []
+    for batch in pool.map(play_batch, [config_path] * len(batches), batches, [max_turns] * len(batches)):
+        results.extend(batch)
+    return results
+
+
+def run_search(config_path, opponents, version='v3', candidates=27, eta=3, min_turns=12, max_turns=100,
+               workers=None, batch_size=4, seed=0):
+    """Returns [(turns, [(fitness, spec), ...] best first), ...], one entry per rung."""
+    rng = random.Random(seed)
+    specs = [candidate_spec(version, StrategyParams())]
+    while len(specs) < candidates:
+        spec = candidate_spec(version, sample_params(rng))
+        if spec not in specs:
+            specs.append(spec)
+
+    rungs = []
+    turns = min_turns
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            results = play_rung(pool, config_path, specs, opponents, turns, batch_size)
+            ranked = sorted(((fitness(results, spec), spec) for spec in specs), reverse=True)
+            rungs.append((turns, ranked))
+            if len(specs) <= 1 or turns >= max_turns:
+                return rungs
+            specs = [spec for _, spec in ranked[:max(1, len(specs) // eta)]]
+            turns = min(max_turns, turns * eta)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--config', required=True)
+    parser.add_argument('--opponents', default='v1,v2,v3')
+    parser.add_argument('--version', default='v3')
+    parser.add_argument('--candidates', type=int, default=27)
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--min-turns', type=int, default=12)
+    parser.add_argument('--max-turns', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--batch', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    opponents = [opponent for opponent in args.opponents.split(',') if opponent]
+    rungs = run_search(args.config, opponents, args.version, args.candidates, args.eta, args.min_turns, args.max_turns,
+                       args.workers, args.batch, args.seed)
+    for turns, ranked in rungs:
+        print('{} candidates, {} turns'.format(len(ranked), turns))
+        for value, spec in ranked[:5]:
+            print('  {:7.3f}  {}'.format(value, spec))
+    print('best: {}'.format(rungs[-1][1][0][1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+"""
+Frame-stepping simulator for our attack waves against the current board.
+
+A wave is a few groups of identical mobile units sharing a spawn and path,
+so a group is simulated as one stack: position on its path, units alive,
+health of the unit currently being focused and shields picked up. Enemy
+structures live in flat arrays. Each simulate() call allocates its state
+once up front and the frame loop itself builds no containers, so hundreds
+of candidate waves fit inside one turn.
+
+Paths are fixed at spawn time and enemy mobile units are not modelled, so
+predictions are optimistic when the enemy deploys interceptors or rebuilds.
+"""
+import sys
+import time
+from array import array
+from collections import namedtuple
+
+from arena import ARENA_SIZE, ARENA_TILES, EDGES, tiles_in_range
+from pathing import get_target_edge
+
+WavePrediction = namedtuple('WavePrediction', ['interceptors', 'scouts', 'spawn', 'scored', 'structure_damage', 'frames'])
+
+SCOUT_INDEX = 3
+INTERCEPTOR_INDEX = 5
+MAX_FRAMES = 300
+
+
+class WaveSimulator:
+    def __init__(self, config, board, path_finder):
+        self.config = config
+        self.path_finder = path_finder
+
+        # Enemy structures, and which of them are turrets
+        self.structure_tiles = array('H')
+        self.structure_health = array('d')
+        turrets = []
+        for i in ARENA_TILES:
+            if board.owner[i] != 1:
+                continue
+            stats = board.stats_at(i)
+            if stats.damage_i > 0:
+                turrets.append((len(self.structure_tiles), frozenset(tiles_in_range(i, stats.attack_range)), stats.damage_i))
+            self.structure_tiles.append(i)
+            self.structure_health.append(board.health[i])
+        self.turrets = tuple(turrets)
+
+        # Our supports: (tiles covered, shield per unit)
+        supports = []
+        for i in ARENA_TILES:
+            if board.owner[i] != 0:
+                continue
+            stats = board.stats_at(i)
+            if stats.shield > 0:
+                supports.append((frozenset(tiles_in_range(i, stats.shield_range)), stats.shield + stats.shield_bonus_y * (i // ARENA_SIZE)))
+        self.supports = tuple(supports)
+
+        # Mobile unit stats packed positionally for the frame loop
+        self._units = tuple(
+            (stats.speed, stats.health, stats.damage_f, stats.attack_range,
+             stats.self_destruct_f, stats.self_destruct_range, stats.self_destruct_steps)
+            for stats in board.stats.levels[0])
+        base = board.stats.levels[0]
+        self._costs = (base[INTERCEPTOR_INDEX].cost_mp, base[SCOUT_INDEX].cost_mp)
+        self._paths = {}
+        self._targets = {}
+
+    def _path(self, spawn):
+        key = (spawn[0], spawn[1])
+        cached = self._paths.get(key)
+        if cached is None:
+            path = self.path_finder.path_to_edge(spawn)
+            if path is None:
+                cached = ((), False)
+            else:
+                end = path[-1]
+                cached = (tuple(x + ARENA_SIZE * y for x, y in path), (end[0], end[1]) in EDGES[get_target_edge(spawn)])
+            self._paths[key] = cached
+        return cached
+
+    def _targets_from(self, tile, attack_range):
+        """Enemy structure ids in range of a tile, nearest first."""
+        key = (tile, attack_range)
+        targets = self._targets.get(key)
+        if targets is None:
+            x, y = tile % ARENA_SIZE, tile // ARENA_SIZE
+            reach = frozenset(tiles_in_range(tile, attack_range))
+            ids = [s for s, t in enumerate(self.structure_tiles) if t in reach]
+            ids.sort(key=lambda s: (self.structure_tiles[s] % ARENA_SIZE - x) ** 2 + (self.structure_tiles[s] // ARENA_SIZE - y) ** 2)
+            targets = tuple(ids)
+            self._targets[key] = targets
+        return targets
+
+    def simulate(self, groups):
+        """
+        groups is a sequence of (unit type index, count, spawn location).
+        Returns (units scored, damage dealt to enemy structures, frames run).
+        """
+        n = len(groups)
+        paths = []
+        breaches = []
+        for _, _, spawn in groups:
+            path, breach = self._path(spawn)
+            paths.append(path)
+            breaches.append(breach)
+        unit_stats = [self._units[unit_type] for unit_type, _, _ in groups]
+        alive = [count if paths[g] else 0 for g, (_, count, _) in enumerate(groups)]
+        step = [0] * n
+        moved = [0] * n
+        progress = [0.0] * n
+        unit_hp = [stats[1] for stats in unit_stats]
+        lead_hp = list(unit_hp)
+        shielded = [0] * n
+        health = array('d', self.structure_health)
+        turrets = self.turrets
+        supports = self.supports
+        structure_tiles = self.structure_tiles
+        scored = 0
+        damage = 0.0
+
+        frame = 0
+        while frame < MAX_FRAMES:
+            active = False
+            # Movement, breaches and self destructs
+            for g in range(n):
+                if not alive[g]:
+                    continue
+                active = True
+                progress[g] += unit_stats[g][0]
+                while progress[g] >= 1 and alive[g]:
+                    progress[g] -= 1
+                    if step[g] < len(paths[g]) - 1:
+                        step[g] += 1
+                        moved[g] += 1
+                        continue
+                    if breaches[g]:
+                        scored += alive[g]
+                    elif moved[g] >= unit_stats[g][6]:
+                        tile = paths[g][step[g]]
+                        blast = unit_stats[g][4] * alive[g]
+                        for s in self._targets_from(tile, unit_stats[g][5]):
+                            if health[s] > 0:
+                                dealt = blast if blast < health[s] else health[s]
+                                health[s] -= dealt
+                                damage += dealt
+                    alive[g] = 0
+            if not active:
+                break
+
+            # Shields from our supports, once per support per group
+            for g in range(n):
+                if not alive[g]:
+                    continue
+                tile = paths[g][step[g]]
+                for s in range(len(supports)):
+                    if not shielded[g] >> s & 1 and tile in supports[s][0]:
+                        shielded[g] |= 1 << s
+                        lead_hp[g] += supports[s][1]
+                        unit_hp[g] += supports[s][1]
+
+            # Our units hit the nearest living structure
+            for g in range(n):
+                if not alive[g] or unit_stats[g][2] <= 0:
+                    continue
+                remaining = unit_stats[g][2] * alive[g]
+                for s in self._targets_from(paths[g][step[g]], unit_stats[g][3]):
+                    if health[s] <= 0:
+                        continue
+                    dealt = remaining if remaining < health[s] else health[s]
+                    health[s] -= dealt
+                    damage += dealt
+                    remaining -= dealt
+                    if remaining <= 0:
+                        break
+
+            # Enemy turrets focus the nearest group in range
+            for s, cover, turret_damage in turrets:
+                if health[s] <= 0:
+                    continue
+                tx, ty = structure_tiles[s] % ARENA_SIZE, structure_tiles[s] // ARENA_SIZE
+                target = -1
+                best = 0
+                for g in range(n):
+                    if alive[g]:
+                        tile = paths[g][step[g]]
+                        if tile in cover:
+                            d = (tile % ARENA_SIZE - tx) ** 2 + (tile // ARENA_SIZE - ty) ** 2
+                            if target < 0 or d < best:
+                                target = g
+                                best = d
+                if target >= 0:
+                    lead_hp[target] -= turret_damage
+                    if lead_hp[target] <= 0:
+                        alive[target] -= 1
+                        lead_hp[target] = unit_hp[target]
+            frame += 1
+
+        return scored, damage, frame
+
+    def predict(self, interceptors, scouts, spawn, interceptor_location):
+        groups = []
+        if interceptors:
+            groups.append((INTERCEPTOR_INDEX, interceptors, interceptor_location))
+        if scouts:
+            groups.append((SCOUT_INDEX, scouts, spawn))
+        scored, damage, frames = self.simulate(groups)
+        return WavePrediction(interceptors, scouts, list(spawn), scored, damage, frames)
+
+    def best_wave(self, mp, spawns, interceptor_location, max_interceptors=8):
+        """
+        Tries every split of mp between interceptors and scouts, at their
+        cost_mp, for every spawn, and returns the prediction scoring most,
+        then dealing most structure damage, then using the fewest
+        interceptors.
+        """
+        interceptor_cost, scout_cost = self._costs
+        best = None
+        for spawn in spawns:
+            for interceptors in range(min(max_interceptors, int(mp // interceptor_cost)) + 1):
+                scouts = int((mp - interceptors * interceptor_cost) // scout_cost)
+                prediction = self.predict(interceptors, scouts, spawn, interceptor_location)
+                if best is None or (prediction.scored, prediction.structure_damage, -prediction.interceptors) > (best.scored, best.structure_damage, -best.interceptors):
+                    best = prediction
+        return best
+
+
+def benchmark(config, waves=200, seed=0):
+    """Simulated frames per second against a random enemy layout."""
+    import random
+    from board import BoardSnapshot
+    from pathing import PathFinder
+
+    rng = random.Random(seed)
+    board = BoardSnapshot(config)
+    enemy_half = [i for i in ARENA_TILES if i // ARENA_SIZE >= 14]
+    for i in rng.sample(enemy_half, 40):
+        board.unit_type[i] = rng.choice((0, 0, 2))
+        board.owner[i] = 1
+        board.health[i] = board.stats_at(i).health
+    simulator = WaveSimulator(config, board, PathFinder(board.blocked()))
+    spawns = EDGES[2] + EDGES[3]
+    frames = 0
+    start = time.perf_counter()
+    for w in range(waves):
+        frames += simulator.predict(w % 8, 10, spawns[w % len(spawns)], [3, 10]).frames
+    elapsed = time.perf_counter() - start
+    return frames / elapsed, waves / elapsed
+
+
+if __name__ == "__main__":
+    import json
+    with open(sys.argv[1]) as config_file:
+        config = json.load(config_file)
+    frames_per_second, waves_per_second = benchmark(config)
+    print('{:.0f} simulated frames/s, {:.0f} waves/s'.format(frames_per_second, waves_per_second))
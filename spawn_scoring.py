@@ -0,0 +1,33 @@
+"""
+Scores every friendly edge spawn in one batched pass.
+
+All bottom-left spawns share the TOP_RIGHT distance field and all
+bottom-right spawns share the TOP_LEFT one, so ranking the ~28 spawns costs
+two BFS passes plus one path walk per spawn.
+"""
+from collections import namedtuple
+
+from arena import EDGES, BOTTOM_LEFT, BOTTOM_RIGHT
+from pathing import get_target_edge
+
+FRIENDLY_EDGE = EDGES[BOTTOM_LEFT] + EDGES[BOTTOM_RIGHT]
+
+SpawnScore = namedtuple('SpawnScore', ['spawn', 'path_length', 'damage', 'breach'])
+
+
+def score_spawns(path_finder, damage_map, spawns=FRIENDLY_EDGE):
+    """
+    Ranked table of SpawnScore rows, best first. Spawns that reach the enemy
+    edge come before ones that self destruct, then least damage taken, then
+    shortest path. breach is the edge tile reached, or None.
+    """
+    table = []
+    for spawn in spawns:
+        path = path_finder.path_to_edge(spawn)
+        if path is None:
+            continue
+        end = path[-1]
+        breach = end if (end[0], end[1]) in EDGES[get_target_edge(spawn)] else None
+        table.append(SpawnScore(list(spawn), len(path), damage_map.path_damage(path), breach))
+    table.sort(key=lambda row: (row.breach is None, row.damage, row.path_length))
+    return table
@@ -0,0 +1,124 @@
+"""
+Tunable thresholds of the v3 strategy.
+
+Every magic number that used to be edited by hand between strategy versions
+lives here as a typed field, so a variant is just a StrategyParams value.
+Overrides are coerced to the field's type, which lets them come from the
+command line or a tournament entrant spec. SEARCH_SPACE lists the values
+search.py samples for each field.
+"""
+from dataclasses import dataclass, fields, replace, asdict
+
+
+@dataclass(frozen=True)
+class StrategyParams:
+    # Attacking
+    attack_turn: int = 2
+    candidate_spawns: int = 4
+    max_interceptors: int = 8
+    # MP at which we attack even if no wave is predicted to score
+    hoard_mp: float = 12
+    # Walls
+    corner_turret_turn: int = 2
+    wall_remove_below: float = 30
+    upgraded_wall_remove_below: float = 80
+    priority_wall_upgrade_turn: int = 5
+    wall_upgrade_turn: int = 6
+    # Turrets
+    corner_turret_sp: float = 4
+    # Least damage per frame summed over the enemy's best path a what-if turret must add
+    corner_turret_gain: float = 0
+    optional_turret_gain: float = 0
+    corner_upgrade_sp: float = 10
+    late_turret_turn: int = 4
+    late_turret_sp: float = 4
+    turret_remove_below: float = 30
+    turret_upgrade_turn: int = 6
+    turret_upgrade_sp: float = 30
+    # Supports
+    support_sp: float = 4
+    early_support_turn: int = 3
+    late_support_turn: int = 5
+    support_upgrade_sp: float = 20
+    support_upgrade_turn: int = 6
+    # Interceptors against an expected enemy wave
+    defend_probability: float = 0.6
+    defense_interceptors: int = 2
+    # Action values for the turn planner, higher is bought first
+    wall_value: float = 100
+    turret_value: float = 90
+    # Added to a turret's value per share of enemy routes it covers
+    threat_weight: float = 5
+    corner_turret_value: float = 80
+    support_value: float = 60
+    corner_upgrade_value: float = 50
+    wall_upgrade_value: float = 40
+    turret_upgrade_value: float = 30
+    support_upgrade_value: float = 20
+    # Whole-turn plan search (turn_search.py); a width of 0 plays the fixed turn
+    search_width: int = 0
+    # Seconds, further capped by what is left of the turn budget
+    search_budget: float = 0.5
+    # Turn option values: per point a wave is predicted to score, next
+    # turn's wave discounted, and per defending interceptor scaled by how
+    # far the enemy's attack probability is above defend_probability
+    score_value: float = 100
+    next_turn_discount: float = 0.8
+    defend_value: float = 30
+    # Plan score per unit of damage on the enemy's best path, and per unit
+    # of planner value bought
+    defense_weight: float = 1
+    build_weight: float = 0.1
+
+    def with_values(self, **values):
+        """Copy with the given fields replaced, coerced to their declared types."""
+        types = {field.name: field.type for field in fields(self)}
+        unknown = set(values) - set(types)
+        if unknown:
+            raise ValueError('Unknown strategy parameters: {}'.format(', '.join(sorted(unknown))))
+        return replace(self, **{name: types[name](value) for name, value in values.items()})
+
+    def changes(self):
+        """Fields that differ from the defaults."""
+        defaults = asdict(StrategyParams())
+        return {name: value for name, value in asdict(self).items() if value != defaults[name]}
+
+
+SEARCH_SPACE = {
+    'attack_turn': (1, 2, 3, 4),
+    'candidate_spawns': (1, 2, 4, 6),
+    'max_interceptors': (0, 4, 8, 12),
+    'hoard_mp': (8, 12, 16),
+    'corner_turret_turn': (1, 2, 3),
+    'wall_remove_below': (0, 20, 30, 45),
+    'upgraded_wall_remove_below': (40, 80, 120),
+    'priority_wall_upgrade_turn': (3, 5, 7),
+    'wall_upgrade_turn': (4, 6, 8),
+    'corner_turret_sp': (2, 4, 6, 8),
+    'corner_turret_gain': (-1, 0, 5, 15),
+    'optional_turret_gain': (-1, 0, 5, 15),
+    'corner_upgrade_sp': (6, 10, 14),
+    'late_turret_turn': (2, 4, 6),
+    'late_turret_sp': (2, 4, 8),
+    'turret_remove_below': (0, 20, 30, 45),
+    'turret_upgrade_turn': (4, 6, 8),
+    'turret_upgrade_sp': (15, 30, 45),
+    'support_sp': (4, 8, 12),
+    'early_support_turn': (2, 3, 5),
+    'late_support_turn': (4, 5, 7),
+    'support_upgrade_sp': (10, 20, 30),
+    'support_upgrade_turn': (4, 6, 8),
+    'defend_probability': (0.4, 0.6, 0.8, 1.01),
+    'defense_interceptors': (1, 2, 4),
+    'threat_weight': (0, 5, 9),
+    'corner_turret_value': (55, 80, 95),
+    'support_value': (35, 60, 85),
+    'wall_upgrade_value': (25, 40, 65),
+    'turret_upgrade_value': (25, 30, 45),
+    'next_turn_discount': (0.6, 0.8, 1.0),
+    'defense_weight': (0.5, 1, 2),
+}
+
+
+def sample_params(rng, space=SEARCH_SPACE):
+    return StrategyParams().with_values(**{name: rng.choice(values) for name, values in space.items()})
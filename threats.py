@@ -0,0 +1,97 @@
+"""
+Where enemy units from every top-edge spawn would go.
+
+All spawns on one top edge head for the same bottom edge, so their routes
+share that edge's BFS distance field: the whole edge costs two BFS passes
+(reused from the PathCache while our layout is unchanged) plus one walk per
+spawn, instead of a find_path_to_edge search per spawn. From the routes come
+a breach-tile histogram, per-tile traffic and the damage our turrets deal on
+every tile of every route.
+
+Only our structures block the enemy routes here, since the enemy opens and
+closes its own walls between turns. update() is cheap to call repeatedly:
+routes are only re-walked when our blocked layout changed, and otherwise
+only the damage along them is refreshed when our turrets changed.
+"""
+from array import array
+from collections import namedtuple
+
+from arena import ARENA_SIZE, NUM_TILES, EDGES, tiles_in_range
+from overlay import ENEMY_EDGE
+from pathing import get_target_edge
+
+# path is a tuple of flat indices, breach the edge tile reached or None,
+# tile_damage what our turrets deal on each path tile per frame
+Threat = namedtuple('Threat', ['spawn', 'path', 'breach', 'tile_damage', 'damage'])
+
+
+class ThreatAnalysis:
+    def __init__(self, spawns=ENEMY_EDGE):
+        self.spawns = spawns
+        self.threats = ()
+        # Number of routes crossing each tile
+        self.traffic = array('H', bytes(2 * NUM_TILES))
+        self.breaches = {}
+        self._blocked = None
+        self._routes = ()
+        self._damage_key = None
+        self._coverage = {}
+
+    def update(self, board, damage_map, path_cache):
+        """damage_map is the map of our own turrets (owner 0)."""
+        blocked = bytearray(owner == 0 for owner in board.owner)
+        if bytes(blocked) != self._blocked:
+            self._blocked = bytes(blocked)
+            self._walk(path_cache.get(blocked))
+            self._damage_key = None
+        damage_key = (id(damage_map), tuple(sorted(damage_map.turrets.items())))
+        if damage_key != self._damage_key:
+            self._damage_key = damage_key
+            grid = damage_map.grid
+            threats = []
+            for spawn, path, breach in self._routes:
+                tile_damage = tuple(grid[i] for i in path)
+                threats.append(Threat(spawn, path, breach, tile_damage, sum(tile_damage)))
+            self.threats = tuple(threats)
+        return self
+
+    def _walk(self, path_finder):
+        routes = []
+        traffic = array('H', bytes(2 * NUM_TILES))
+        breaches = {}
+        for spawn in self.spawns:
+            path = path_finder.path_to_edge(spawn)
+            if path is None:
+                continue
+            flat = tuple(x + ARENA_SIZE * y for x, y in path)
+            for i in set(flat):
+                traffic[i] += 1
+            end = (path[-1][0], path[-1][1])
+            breach = end if end in EDGES[get_target_edge(spawn)] else None
+            if breach is not None:
+                breaches[breach] = breaches.get(breach, 0) + 1
+            routes.append((tuple(spawn), flat, breach))
+        self._routes = tuple(routes)
+        self.traffic = traffic
+        self.breaches = breaches
+        self._coverage = {}
+
+    def breach_histogram(self):
+        """[(edge tile, number of spawns breaching there)], most used first."""
+        return sorted(self.breaches.items(), key=lambda item: -item[1])
+
+    def weakest(self):
+        """The breaching route our turrets hurt least, or None."""
+        breaching = [threat for threat in self.threats if threat.breach is not None]
+        return min(breaching, key=lambda threat: threat.damage) if breaching else None
+
+    def coverage(self, location, attack_range):
+        """Share of enemy routes passing within attack_range of location."""
+        key = (location[0], location[1], attack_range)
+        cached = self._coverage.get(key)
+        if cached is None:
+            cover = frozenset(tiles_in_range(location[0] + ARENA_SIZE * location[1], attack_range))
+            routes = self._routes
+            hit = sum(1 for _, path, _ in routes if not cover.isdisjoint(path))
+            cached = self._coverage[key] = hit / len(routes) if routes else 0.0
+        return cached
@@ -0,0 +1,203 @@
+"""
+Parallel self-play tournament between strategy versions.
+
+Every ordered pair of entrants plays on the local engine (local_engine.py),
+so each pairing is played from both sides. Games are handed to a process
+pool in batches; a worker keeps its imported strategy modules and the parsed
+config between games. Each finished game is appended to a JSON-lines
+checkpoint, and a rerun with the same checkpoint only plays the games that
+are missing from it. Elo ratings and a pairwise win-rate table are printed
+at the end.
+
+An entrant is a module name, optionally followed by overrides. Overrides
+naming a field of the strategy's params (strategy_params.StrategyParams)
+replace that field; any other override is set as an attribute on the
+AlgoStrategy instance before the game starts:
+
+    python tournament.py --config game-configs.json --workers 8 v2 v3 "v3:attack_turn=3,support_sp=8"
+"""
+import argparse
+import importlib
+import itertools
+import json
+import random
+import sys
+import zlib
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from local_engine import Match
+
+Game = namedtuple('Game', ['game_id', 'entrants', 'seed'])
+
+_config_cache = {}
+
+
+def parse_entrant(spec):
+    """'v3:A=1,B=x' -> ('v3', {'A': 1, 'B': 'x'})"""
+    version, _, rest = spec.partition(':')
+    overrides = {}
+    for item in filter(None, rest.split(',')):
+        key, _, value = item.partition('=')
+        try:
+            overrides[key] = json.loads(value)
+        except ValueError:
+            overrides[key] = value
+    return version, overrides
+
+
+def build_algo(spec):
+    version, overrides = parse_entrant(spec)
+    module = importlib.import_module(version)
+    gamelib = module.gamelib
+    gamelib.debug_write = lambda *args: None
+    gamelib.util.debug_write = gamelib.debug_write
+    algo = module.AlgoStrategy()
+    params = getattr(algo, 'params', None)
+    if params is not None:
+        algo.params = params.with_values(**{key: value for key, value in overrides.items() if hasattr(params, key)})
+    for key, value in overrides.items():
+        if params is None or not hasattr(params, key):
+            setattr(algo, key, value)
+    return algo
+
+
+def capture(algo, turn_string):
+    """Runs one turn and returns the (build, deploy) stacks submit_turn sent."""
+    commands = []
+    sys.modules[type(algo).__module__].gamelib.game_state.send_command = commands.append
+    algo.on_turn(turn_string)
+    if len(commands) < 2:
+        return [], []
+    return json.loads(commands[0]), json.loads(commands[1])
+
+
+def schedule(entrants, rounds=1):
+    games = []
+    for round_number in range(rounds):
+        for first, second in itertools.permutations(entrants, 2):
+            game_id = '{}:{}|{}'.format(round_number, first, second)
+            games.append(Game(game_id, (first, second), zlib.crc32(game_id.encode())))
+    return games
+
+
+def play_batch(config_path, games, max_turns=100):
+    if config_path not in _config_cache:
+        with open(config_path) as config_file:
+            _config_cache[config_path] = json.load(config_file)
+    config = _config_cache[config_path]
+    results = []
+    for game in games:
+        random.seed(game.seed)
+        try:
+            algos = [build_algo(spec) for spec in game.entrants]
+            result = Match(config, algos, capture, max_turns).play()
+            results.append({'game_id': game.game_id, 'entrants': list(game.entrants), 'winner': result.winner,
+                            'turns': result.turns, 'health': list(result.health), 'error': result.error})
+        except Exception as error:
+            results.append({'game_id': game.game_id, 'entrants': list(game.entrants), 'winner': None,
+                            'turns': 0, 'health': [0, 0], 'error': '{}: {}'.format(type(error).__name__, error)})
+    return results
+
+
+def load_checkpoint(path):
+    results = {}
+    try:
+        with open(path) as checkpoint:
+            for line in checkpoint:
+                if line.strip():
+                    result = json.loads(line)
+                    results[result['game_id']] = result
+    except FileNotFoundError:
+        pass
+    return results
+
+
+def run_tournament(entrants, config_path, rounds=1, workers=None, checkpoint=None, batch_size=4, max_turns=100):
+    done = load_checkpoint(checkpoint) if checkpoint else {}
+    pending = [game for game in schedule(entrants, rounds) if game.game_id not in done]
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    sink = open(checkpoint, 'a') if checkpoint else None
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(play_batch, config_path, batch, max_turns) for batch in batches]
+            for future in as_completed(futures):
+                for result in future.result():
+                    done[result['game_id']] = result
+                    if sink:
+                        sink.write(json.dumps(result) + '\n')
+                if sink:
+                    sink.flush()
+    finally:
+        if sink:
+            sink.close()
+    return [done[game_id] for game_id in sorted(done)]
+
+
+def score(result, side):
+    """1 for a win, 0.5 for a draw, 0 for a loss from the given side."""
+    if result['winner'] is None:
+        return 0.5
+    return 1.0 if result['winner'] == side else 0.0
+
+
+def elo(results, k=16, base=1500, passes=10):
+    """Elo over the games in game_id order, repeated so the order matters less."""
+    ratings = {}
+    for _ in range(passes):
+        for result in results:
+            first, second = result['entrants']
+            a, b = ratings.setdefault(first, base), ratings.setdefault(second, base)
+            expected = 1 / (1 + 10 ** ((b - a) / 400))
+            delta = k * (score(result, 0) - expected)
+            ratings[first] = a + delta
+            ratings[second] = b - delta
+    return ratings
+
+
+def win_rates(results):
+    """{(row, column): (score, games)} with row's score against column over both sides."""
+    table = {}
+    for result in results:
+        for side in (0, 1):
+            key = (result['entrants'][side], result['entrants'][1 - side])
+            total, games = table.get(key, (0.0, 0))
+            table[key] = (total + score(result, side), games + 1)
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('entrants', nargs='+')
+    parser.add_argument('--config', required=True)
+    parser.add_argument('--rounds', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--batch', type=int, default=4)
+    parser.add_argument('--max-turns', type=int, default=100)
+    parser.add_argument('--checkpoint', default='tournament.jsonl')
+    args = parser.parse_args(argv)
+
+    results = run_tournament(args.entrants, args.config, args.rounds, args.workers, args.checkpoint, args.batch, args.max_turns)
+    results = [result for result in results if result['entrants'][0] in args.entrants and result['entrants'][1] in args.entrants]
+
+    ratings = elo(results)
+    table = win_rates(results)
+    width = max(8, max(len(entrant) for entrant in args.entrants) + 2)
+    print('{:<{w}}{:>8}'.format('entrant', 'elo', w=width))
+    for entrant in sorted(args.entrants, key=lambda name: -ratings.get(name, 0)):
+        print('{:<{w}}{:>8.0f}'.format(entrant, ratings.get(entrant, 0), w=width))
+    print()
+    print(''.join(['{:<{w}}'.format('', w=width)] + ['{:>{w}}'.format(entrant, w=width) for entrant in args.entrants]))
+    for row in args.entrants:
+        cells = []
+        for column in args.entrants:
+            total, games = table.get((row, column), (0.0, 0))
+            cells.append('{:>{w}}'.format('{:.0%}'.format(total / games) if games else '-', w=width))
+        print('{:<{w}}'.format(row, w=width) + ''.join(cells))
+    errors = [result for result in results if result['error']]
+    for result in errors:
+        print('{}: {}'.format(result['game_id'], result['error']), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+"""
+Time-bounded beam search over whole-turn plans.
+
+The fixed turn builds the funnel greedily and then picks one of holding,
+opening the funnel gap, attacking or defending. Here each of those is a
+TurnOption. Every option carries the ActionPlanner the fixed turn would have
+built for it, and a value for what it does with MP: points scored now, or a
+discounted share of next turn's wave. A plan is an option plus the set of
+planner candidates it buys.
+
+Each option's greedy build is scored in-process first, so the search always
+has an answer. Each beam level then expands the best plans by buying one
+more candidate, dropping the cheapest ones to pay for it, or dropping one
+candidate and refilling greedily. New plans are scored in a process pool
+until the deadline. A plan's score is its option's value, plus the damage
+our turrets would deal on the enemy's most dangerous path with the plan
+built (BoardOverlay.defense_value), plus a small share of the planner values
+it buys. Evaluations still running at the deadline are dropped, and the best
+plan scored so far is returned.
+
+Different options and move orders often end at the same layout; holding
+and defending build alike, for one. Plans are hashed by layout
+(zobrist.py), each distinct layout is evaluated once, and its defense is
+kept in a TranspositionTable that lasts the whole game, so a layout seen on
+an earlier turn is not evaluated again.
+
+Workers are started with the spawn method. A forked child would share this
+process's stdout buffer and could flush half a command to the engine when
+it exits.
+"""
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from arena import ARENA_SIZE
+from action_planner import SPAWN, UPGRADE, TurnPlan
+from overlay import BoardOverlay
+from bitboard import BitPathFinder
+from pathing import PathCache
+from zobrist import TranspositionTable
+
+HOLD = 0
+DEFEND = 1
+OPEN = 2
+WAIT = 3
+ATTACK = 4
+MODE_NAMES = ('hold', 'defend', 'open', 'wait', 'attack')
+
+# value is what the option is worth apart from its build; removals are
+# made on top of the planner's own
+TurnOption = namedtuple('TurnOption', ['mode', 'planner', 'value', 'removals'])
+# bought is a frozenset of Candidate.order
+ScoredPlan = namedtuple('ScoredPlan', ['score', 'option', 'bought', 'defense'])
+
+# Damage on the enemy's best path counted for a layout the enemy cannot path through
+MAX_DEFENSE = 1000.0
+
+_pools = {}
+_worker_paths = None
+
+
+def _by_score(plan):
+    return plan.score
+
+
+def _tile(candidate):
+    return candidate.location[0] + ARENA_SIZE * candidate.location[1]
+
+
+def pool(workers):
+    """One process pool per worker count, shared by every game in this process."""
+    executor = _pools.get(workers)
+    if executor is None:
+        executor = _pools[workers] = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+    return executor
+
+
+def plan_changes(planner, bought, removals=()):
+    """Overlay changes for the bought candidates: ((location, type index, upgraded) or (location, None), ...)."""
+    board = planner.board
+    candidates = planner.candidates
+    upgraded = {_tile(candidates[o]) for o in bought if candidates[o].kind == UPGRADE}
+    spawned = {_tile(candidates[o]) for o in bought if candidates[o].kind == SPAWN}
+    changes = []
+    for o in sorted(bought):
+        candidate = candidates[o]
+        i = _tile(candidate)
+        if candidate.kind == SPAWN:
+            changes.append((candidate.location, board.type_index[candidate.unit_type], i in upgraded))
+        elif candidate.kind == UPGRADE and i not in spawned:
+            changes.append((candidate.location, board.unit_type[i], True))
+    for location in tuple(planner.removals) + tuple(removals):
+        changes.append((location, None))
+    return tuple(changes)
+
+
+def apply_changes(overlay, changes):
+    for change in changes:
+        if change[1] is None:
+            overlay.remove(change[0])
+        else:
+            overlay.add(change[0], change[1], 0, change[2])
+    return overlay
+
+
+def defense_values(board, damage_maps, jobs, path_cache=None):
+    """defense_value() with each job's changes applied; also the pool workers' entry point."""
+    global _worker_paths
+    if path_cache is None:
+        if _worker_paths is None:
+            _worker_paths = PathCache(8, BitPathFinder)
+        path_cache = _worker_paths
+    base = BoardOverlay(board, damage_maps, path_cache)
+    return [min(apply_changes(base.with_changes(), changes).defense_value(), MAX_DEFENSE) for changes in jobs]
+
+
+class TurnSearch:
+    def __init__(self, width=4, workers=None, defense_weight=1.0, build_weight=0.1, table=None):
+        self.width = width
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.defense_weight = defense_weight
+        self.build_weight = build_weight
+        # Plan defense by layout hash, kept across turns
+        self.table = TranspositionTable() if table is None else table
+        # Filled by search() for profiling: plans scored, beam levels
+        # finished and the error that cut a search short
+        self.evaluated = 0
+        self.levels = 0
+        self.error = None
+
+    def start(self):
+        """Starts the pool's workers ahead of the first turn that needs them."""
+        if self.workers > 1:
+            executor = pool(self.workers)
+            wait([executor.submit(int) for _ in range(self.workers)])
+
+    def score(self, option, bought, defense):
+        candidates = option.planner.candidates
+        return (option.value + self.defense_weight * defense
+                + self.build_weight * sum(candidates[o].value for o in bought))
+
+    def greedy(self, option):
+        plan = option.planner.solve()
+        return frozenset(candidate.order for candidate in plan.spawns + plan.upgrades)
+
+    def neighbours(self, option, bought):
+        planner = option.planner
+        candidates = planner.candidates
+        by_value = sorted(candidates, key=lambda c: (-c.value, c.order))
+        spent = sum(candidates[o].cost for o in bought)
+        children = []
+        # Buy one more, dropping the least valuable purchases to afford it
+        for candidate in by_value:
+            if candidate.order in bought:
+                continue
+            child = set(bought)
+            child.add(candidate.order)
+            cost = spent + candidate.cost
+            for dropped in reversed(by_value):
+                if cost <= planner.sp:
+                    break
+                if dropped.order in child and dropped.order != candidate.order:
+                    child.discard(dropped.order)
+                    cost -= dropped.cost
+            if cost <= planner.sp:
+                children.append(self.feasible(planner, child))
+        # Drop one and refill greedily without it
+        for o in bought:
+            child = set(bought)
+            child.discard(o)
+            cost = spent - candidates[o].cost
+            for candidate in by_value:
+                if candidate.order not in child and candidate.order != o and cost + candidate.cost <= planner.sp:
+                    child.add(candidate.order)
+                    cost += candidate.cost
+            children.append(self.feasible(planner, child))
+        return children
+
+    def feasible(self, planner, bought):
+        """Drops upgrades of tiles that only a spawn candidate left unbought would fill."""
+        candidates = planner.candidates
+        new = {_tile(candidate) for candidate in candidates if candidate.kind == SPAWN}
+        spawned = {_tile(candidates[o]) for o in bought if candidates[o].kind == SPAWN}
+        return frozenset(o for o in bought if candidates[o].kind != UPGRADE or
+                         _tile(candidates[o]) not in new or _tile(candidates[o]) in spawned)
+
+    def turn_plan(self, option, bought):
+        """The plan as a TurnPlan for ActionPlanner.execute(), without deploys."""
+        planner = option.planner
+        chosen = [candidate for candidate in planner.candidates if candidate.order in bought]
+        spawns = [candidate for candidate in chosen if candidate.kind == SPAWN]
+        upgrades = [candidate for candidate in chosen if candidate.kind == UPGRADE]
+        return TurnPlan(spawns, upgrades, list(planner.removals) + list(option.removals), [],
+                        sum(candidate.cost for candidate in chosen), 0)
+
+    def search(self, board, damage_maps, path_cache, options, deadline):
+        """
+        Best ScoredPlan found before deadline (a time.perf_counter() value).
+        The options' greedy plans are always scored, however late it is.
+        """
+        self.evaluated = 0
+        self.levels = 0
+        self.error = None
+        roots = [(index, self.greedy(option)) for index, option in enumerate(options)]
+        scored = {}
+        for key, defense in self._evaluate(board, damage_maps, path_cache, options, roots):
+            scored[key] = self._scored(options, key, defense)
+        beam = sorted(scored.values(), key=_by_score, reverse=True)[:self.width]
+
+        while beam and time.perf_counter() < deadline:
+            frontier = {}
+            for plan in beam:
+                for child in self.neighbours(options[plan.option], plan.bought):
+                    if (plan.option, child) not in scored:
+                        frontier[plan.option, child] = None
+            if not frontier:
+                break
+            try:
+                results = self._evaluate(board, damage_maps, path_cache, options, list(frontier), deadline)
+            except Exception as error:
+                # A broken pool costs the rest of this search, not the turn
+                self.error = error
+                break
+            for key, defense in results:
+                scored[key] = self._scored(options, key, defense)
+            if len(results) < len(frontier):
+                break
+            self.levels += 1
+            beam = sorted((scored[key] for key in frontier), key=_by_score, reverse=True)[:self.width]
+        self.evaluated = len(scored)
+        return max(scored.values(), key=_by_score)
+
+    def _scored(self, options, key, defense):
+        index, bought = key
+        return ScoredPlan(self.score(options[index], bought, defense), index, bought, defense)
+
+    def _evaluate(self, board, damage_maps, path_cache, options, plans, deadline=None):
+        """
+        ((option index, bought), defense) for every plan scored before the
+        deadline, or for all of them in-process without one. Each layout
+        not already in the table is evaluated once.
+        """
+        base = BoardOverlay(board, damage_maps, path_cache)
+        results = []
+        layouts = {}
+        for key in plans:
+            index, bought = key
+            changes = plan_changes(options[index].planner, bought, options[index].removals)
+            h = apply_changes(base.with_changes(), changes).hash
+            if h in layouts:
+                layouts[h][1].append(key)
+                continue
+            defense = self.table.lookup(('plan_defense', h))
+            if defense is None:
+                layouts[h] = (changes, [key])
+            else:
+                results.append((key, defense))
+        hashes = list(layouts)
+        jobs = [layouts[h][0] for h in hashes]
+        for job, defense in self._run(board, damage_maps, path_cache, jobs, deadline):
+            self.table.store(('plan_defense', hashes[job]), defense)
+            results.extend((key, defense) for key in layouts[hashes[job]][1])
+        return results
+
+    def _run(self, board, damage_maps, path_cache, jobs, deadline):
+        """(job index, defense) for the jobs finished before the deadline."""
+        if deadline is None:
+            return enumerate(defense_values(board, damage_maps, jobs, path_cache))
+        if self.workers <= 1:
+            results = []
+            for job, changes in enumerate(jobs):
+                if time.perf_counter() >= deadline:
+                    break
+                results.append((job, defense_values(board, damage_maps, (changes,), path_cache)[0]))
+            return results
+        executor = pool(self.workers)
+        chunk = max(1, -(-len(jobs) // (2 * self.workers)))
+        futures = {}
+        for start in range(0, len(jobs), chunk):
+            futures[executor.submit(defense_values, board, damage_maps, jobs[start:start + chunk])] = range(start, min(start + chunk, len(jobs)))
+        results = []
+        pending = set(futures)
+        while pending:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                results.extend(zip(futures[future], future.result()))
+        for future in pending:
+            future.cancel()
+        return results
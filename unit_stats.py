@@ -0,0 +1,62 @@
+"""
+Unit statistics table built once per game from config["unitInformation"].
+
+Every type gets one UnitStats row per upgrade level (level 1 is the base
+row with the config's "upgrade" values applied), so a lookup is two tuple
+indexings instead of nested dict gets or a GameUnit construction. At level
+1, cost_sp is the price of the upgrade itself, as gamelib charges it.
+"""
+from collections import namedtuple
+
+UnitStats = namedtuple('UnitStats', [
+    'shorthand', 'cost_sp', 'cost_mp', 'health', 'speed', 'attack_range', 'damage_f', 'damage_i',
+    'shield', 'shield_bonus_y', 'shield_range', 'self_destruct_f', 'self_destruct_i', 'self_destruct_range',
+    'self_destruct_steps', 'breach_damage', 'refund'])
+
+NUMERIC_FIELDS = UnitStats._fields[1:]
+
+_tables = {}
+
+
+def _row(unit):
+    health = unit.get("startHealth", 0)
+    return UnitStats(
+        unit.get("shorthand"), unit.get("cost1", 0), unit.get("cost2", 0), health, unit.get("speed", 0),
+        unit.get("attackRange", 0), unit.get("attackDamageTower", 0), unit.get("attackDamageWalker", 0),
+        unit.get("shieldPerUnit", 0), unit.get("shieldBonusPerY", 0), unit.get("shieldRange", 0),
+        unit.get("selfDestructDamageTower", health), unit.get("selfDestructDamageWalker", health),
+        unit.get("selfDestructRange", 1.5), unit.get("selfDestructStepsRequired", 5),
+        unit.get("playerBreachDamage", 1), unit.get("refundPercentage", 0.75))
+
+
+class UnitStatsTable:
+    def __init__(self, config):
+        self.config = config
+        info = config["unitInformation"]
+        base = tuple(_row(unit) for unit in info)
+        upgraded = tuple(_row(dict(unit, **unit.get("upgrade", {}))) for unit in info)
+        # levels[upgraded][type index]
+        self.levels = (base, upgraded)
+        self.type_index = {row.shorthand: i for i, row in enumerate(base)}
+
+    def get(self, unit_type, upgraded=False):
+        """Row for a type index or shorthand at the given upgrade level."""
+        if isinstance(unit_type, str):
+            unit_type = self.type_index[unit_type]
+        return self.levels[1 if upgraded else 0][unit_type]
+
+    def delta(self, unit_type):
+        """What upgrading adds to each numeric stat."""
+        base, upgraded = self.get(unit_type), self.get(unit_type, True)
+        return {name: getattr(upgraded, name) - getattr(base, name) for name in NUMERIC_FIELDS
+                if name != 'cost_sp' and getattr(upgraded, name) != getattr(base, name)}
+
+
+def unit_stats(config):
+    """The table for this config dict, built on first use."""
+    table = _tables.get(id(config))
+    if table is None or table.config is not config:
+        if len(_tables) >= 8:
+            _tables.clear()
+        table = _tables[id(config)] = UnitStatsTable(config)
+    return table
@@ -1,17 +1,114 @@
+import os
+import time
+
 import gamelib
-import random
-import math
-import warnings
-from sys import maxsize
-import json
-from math import *
+from action_frames import ActionFrameTracker
+from action_planner import ActionPlanner
+from arena import ARENA_SIZE, TOP_LEFT
+from background import BackgroundAnalysis
+from bitboard import BitPathFinder, locations, mask_of
+from enemy_model import EnemyModel
+from incremental import IncrementalState
+from layouts import LayoutRegistry
+from maintenance import TilePolicy, tile_policies
+from opening_book import OpeningBook, MAX_TURN, DEFAULT_PATH, book_fingerprint, code_version, play_entry, position_key
+from overlay import BoardOverlay
+from profiling import TurnProfiler, profiled
+from query_cache import QueryCache
+from simulator import WaveSimulator
+from spawn_scoring import score_spawns
+from threats import ThreatAnalysis
+from strategy_params import StrategyParams
+from unit_stats import unit_stats
+from zobrist import TranspositionTable
+
+LEFT_WALLS = ((3, 13), (4, 12), (5, 11), (6, 11), (7, 10), (8, 10), (10, 10), (11, 9), (13, 8))
+RIGHT_WALLS = ((27, 13), (26, 13), (25, 13), (24, 13), (23, 12), (22, 11), (21, 11), (20, 10), (19, 10), (17, 10), (16, 9), (14, 8))
+FUNNEL_GAP = ((1, 13),)
+SUICIDE_INTERCEPTOR_LOCATION = [3, 10]
+FALLBACK_SCOUT_SPAWN = [14, 0]
+# Left and right spawns for interceptors meeting an enemy wave
+DEFENSE_INTERCEPTOR_LOCATIONS = ([3, 10], [24, 10])
+# Per-phase timings go to debug_write when enabled; the budget (seconds)
+# is a soft deadline that optional analysis backs off from
+PROFILE = False
+TURN_BUDGET = 3.0
+# Precompute next turn's queries on a worker thread during the action phase
+BACKGROUND = True
+# Processes scoring turn plans when params.search_width > 0, None for one per core
+SEARCH_WORKERS = None
+# Opening book played on the first BOOK_TURNS turns; None plays them live
+OPENING_BOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), DEFAULT_PATH)
+BOOK_TURNS = MAX_TURN
+# Layout evaluations kept for the whole game, about 200 bytes each
+POSITION_TABLE_SIZE = 4096
+CORNERS = ((0, 13), (2, 13))
+# Funnel mouth and the walls next to it are upgraded first, from turn 5
+PRIORITY_WALLS = LEFT_WALLS[:1] + RIGHT_WALLS[:4] + FUNNEL_GAP
+BASE_TURRETS = ((18, 10), (9, 10), (6, 10), (21, 10), (24, 12), (3, 12), (12, 8), (15, 8))
+LATE_TURRETS = ((7, 12), (20, 12))
+# Late turrets that are only built when they make the enemy's best path costlier
+OPTIONAL_TURRETS = ((11, 8), (16, 8))
+EARLY_SUPPORTS = ((7, 9), (8, 9))
+LATE_SUPPORTS = ((7, 8), (8, 8))
+FUNNEL_STRUCTURES = ((0, 13), (2, 13), (3, 13), (4, 12), (5, 11), (6, 11), (7, 10), (8, 10), (9, 10), (10, 10), (11, 9), (12, 8), (13, 8), (15, 8), (27, 13), (26, 13), (25, 13), (24, 13), (23, 12), (22, 11), (21, 11), (20, 10), (18, 10), (19, 10), (17, 10), (16, 9), (14, 8))
+
+
+def attack_blocked(board):
+    """Our pathing blocks with the funnel gap open, as it is when we attack."""
+    blocked = board.blocked()
+    for x, y in FUNNEL_GAP:
+        blocked[x + ARENA_SIZE * y] = 0
+    return blocked
+
+
+def choose_optional_turrets(board, overlay, layouts, params):
+    """
+    Keeps optional turrets we already have, then tries each combination
+    of the empty ones on top of the rest of the late layout and keeps the
+    smallest one that makes the enemy's most dangerous path costliest.
+    """
+    occupancy = board.occupancy()
+    planned = overlay.with_changes()
+    for location in locations(occupancy.empty(layouts[('turrets', True, ())].mask)):
+        planned.add(location, TURRET)
+    optional = layouts['optional_turrets'].mask
+    kept = occupancy.of(board.type_index[TURRET]) & optional
+    empty = occupancy.empty(optional)
+    best, best_value = kept, planned.defense_value() + params.optional_turret_gain
+    for extras in (OPTIONAL_TURRETS[:1], OPTIONAL_TURRETS[1:], OPTIONAL_TURRETS):
+        added = mask_of(extras)
+        if empty & added != added:
+            continue
+        option = planned.with_changes()
+        for location in extras:
+            option.add(location, TURRET)
+        value = option.defense_value()
+        if value > best_value:
+            best, best_value = kept | added, value
+    return tuple(location for location in OPTIONAL_TURRETS if mask_of((location,)) & best)
+
+
+def corner_turret_gain(board, overlay, corners):
+    """Extra damage on the enemy's least defended path from corner turrets instead of corner walls."""
+    if board.occupancy().of(board.type_index[TURRET]) & corners.mask == corners.mask:
+        return float('inf')
+    # Corners guard the funnel gap, so judge them with the gap open
+    walls = overlay.with_changes()
+    turrets = overlay.with_changes()
+    for location in FUNNEL_GAP:
+        walls.remove(location)
+        turrets.remove(location)
+    for location in corners:
+        walls.add(location, WALL)
+        turrets.add(location, TURRET)
+    return turrets.defense_value() - walls.defense_value()
+
 
 class AlgoStrategy(gamelib.AlgoCore):
     def __init__(self):
         super().__init__()
-        seed = random.randrange(maxsize)
-        random.seed(seed)
-        gamelib.debug_write('Random seed: {}'.format(seed))
+        self.params = StrategyParams()
 
     def on_game_start(self, config):
         """
@@ -30,28 +127,129 @@ class AlgoStrategy(gamelib.AlgoCore):
         SP = 0
         # This is a good place to do initial setup
         self.scored_on_locations = []
+        self.action_frames = ActionFrameTracker()
+        self.enemy_model = EnemyModel()
+        self.queries = QueryCache()
+        self.threats = ThreatAnalysis()
+        # Room for the what-if layouts next to the attack pathing
+        self.state = IncrementalState(path_cache_size=8, finder=BitPathFinder)
+        self.profiler = TurnProfiler(PROFILE, TURN_BUDGET, sink=gamelib.debug_write)
+        self.layouts = self.compile_layouts()
+        self.positions = TranspositionTable(POSITION_TABLE_SIZE)
+        self.background = BackgroundAnalysis(config, self.speculate, finder=BitPathFinder) if BACKGROUND else None
+        self.turn_search = None
+        if self.params.search_width > 0:
+            # Only imported when enabled: it pulls in multiprocessing and concurrent.futures
+            from turn_search import TurnSearch
+            self.turn_search = TurnSearch(self.params.search_width, SEARCH_WORKERS, self.params.defense_weight, self.params.build_weight, self.positions)
+            self.turn_search.start()
+        self.book = self.load_book()
+        self.book_key = None
+        # Built here so the first turn's snapshot finds it cached
+        unit_stats(config)
+        # The engine times the process from launch, which includes our imports
+        gamelib.debug_write('Started after {:.0f}ms of CPU'.format(time.process_time() * 1000))
+
+    def load_book(self):
+        book = OpeningBook.load(OPENING_BOOK) if OPENING_BOOK else None
+        if book is not None and book.fingerprint != book_fingerprint(self.params, self.config, code_version(__file__)):
+            gamelib.debug_write('Opening book was built for other parameters, config or code, ignoring it')
+            return None
+        return book
+
+    def compile_layouts(self):
+        params = self.params
+        layouts = LayoutRegistry()
+        for attacking in (False, True):
+            for corner_walls in (False, True):
+                locations = LEFT_WALLS + RIGHT_WALLS
+                if not attacking:
+                    locations += FUNNEL_GAP
+                if corner_walls:
+                    locations += CORNERS
+                policies = [TilePolicy(location, WALL, params.wall_remove_below, params.upgraded_wall_remove_below, 0, params.priority_wall_upgrade_turn)
+                            if location in PRIORITY_WALLS else
+                            TilePolicy(location, WALL, params.wall_remove_below, params.upgraded_wall_remove_below, 1, params.wall_upgrade_turn)
+                            for location in locations]
+                layouts.add(('walls', attacking, corner_walls), locations, policies)
+        for late in (False, True):
+            for extras in ((), OPTIONAL_TURRETS[:1], OPTIONAL_TURRETS[1:], OPTIONAL_TURRETS):
+                locations = BASE_TURRETS + LATE_TURRETS + extras if late else BASE_TURRETS
+                layouts.add(('turrets', late, extras), locations, tile_policies(locations, TURRET, remove_below=params.turret_remove_below,
+                                                                                upgrade_priority=0, upgrade_turn=params.turret_upgrade_turn))
+        layouts.add(('supports', 0), ())
+        layouts.add(('supports', 1), EARLY_SUPPORTS)
+        layouts.add(('supports', 2), EARLY_SUPPORTS + LATE_SUPPORTS)
+        layouts.add('corners', CORNERS)
+        layouts.add('optional_turrets', OPTIONAL_TURRETS)
+        layouts.add('funnel', FUNNEL_STRUCTURES)
+        return layouts
 
     def on_turn(self, turn_state):
+        self.profiler.start_turn()
         game_state = gamelib.GameState(self.config, turn_state)
+        self.profiler.turn = game_state.turn_number
         self.game_state = game_state
+        self.board = self.state.advance(game_state)
+        self.damage_map = self.state.damage_maps[1]
+        self.queries.begin_turn(game_state.turn_number, self.board)
+        self.adopt_speculation()
+        self.scored_on_locations = self.action_frames.scored_on_locations()
+        self.enemy_model.observe(game_state.get_resource(MP, 1), self.action_frames.enemy_spawns, self.action_frames.enemy_breaches)
         gamelib.debug_write('Performing turn {} of your custom algo strategy'.format(game_state.turn_number))
         game_state.suppress_warnings(True)  #Comment or remove this line to enable warnings.
 
-        self.starter_strategy(game_state)
+        if not self.play_opening(game_state):
+            self.starter_strategy(game_state)
 
         game_state.submit_turn()
+        if PROFILE:
+            gamelib.debug_write(self.queries.summary())
+            if self.book is not None:
+                gamelib.debug_write('Opening book: {} hits, {} misses'.format(self.book.hits, self.book.misses))
+            gamelib.debug_write('Position table: {}'.format(self.positions.stats()))
+            gamelib.debug_write('Enemy breach tiles: {}'.format(self.threats.breach_histogram()[:4]))
+        self.profiler.end_turn()
 
     """
     NOTE: All the methods after this point are part of the sample starter-algo
     strategy and can safely be replaced for your custom algo.
     """
 
-    def starter_strategy(self, game_state):
-
-        num_interceptors = self.get_num_interceptors(game_state)
-        num_scouts = self.get_num_scouts(game_state, num_interceptors)
+    def play_opening(self, game_state):
+        """Plays this turn from the opening book if it has the position."""
+        self.book_key = None
+        if game_state.turn_number > BOOK_TURNS:
+            return False
+        # The enemy model is the only history the early turns read
+        history = (self.enemy_model.attack_probability(), self.enemy_model.likely_side()[0])
+        self.book_key = position_key(game_state, self.board, history)
+        entry = self.book.lookup(self.book_key) if self.book is not None else None
+        if entry is None:
+            return False
+        refused = play_entry(game_state, entry)
+        if refused:
+            gamelib.debug_write('Opening book: {} commands refused'.format(refused))
+        return True
 
-        attacking = num_scouts >= 8 or (game_state.enemy_health < num_scouts)
+    @profiled('starter_strategy')
+    def starter_strategy(self, game_state):
+        if self.turn_search is not None:
+            self.search_turn(game_state)
+            return
+
+        # Attack once waiting a turn would not score more, counting next
+        # turn's wave at next_turn_discount since projected MP is nearly
+        # always higher; with hoard_mp saved, attack whatever the prediction
+        mp = game_state.get_resource(MP, 0)
+        wave = self.plan_wave(game_state, mp)
+        attacking = False
+        if wave is not None:
+            attacking = wave.scored >= game_state.enemy_health or mp >= self.params.hoard_mp
+            # Comparing against next turn is optional, skip it when short on time
+            if not attacking and wave.scored > 0 and self.profiler.can_afford(0.5):
+                next_wave = self.plan_wave(game_state, game_state.project_future_MP(1, 0))
+                attacking = next_wave is None or wave.scored >= self.params.next_turn_discount * next_wave.scored
 
         # First, place basic defenses
         self.base_funnel(game_state, attacking)
@@ -59,158 +257,231 @@ class AlgoStrategy(gamelib.AlgoCore):
         if not self.structures_placed(game_state):
             attacking = False
 
-        if game_state.turn_number >= 2 and attacking:
-            if game_state.contains_stationary_unit([1, 13]):
-                game_state.attempt_remove([1, 13])
+        if game_state.turn_number >= self.params.attack_turn and attacking:
+            if self.board.contains_stationary_unit([1, 13]):
+                self.board.remove(game_state, [1, 13])
                 return
 
             self.infiltrate(game_state)
+        elif self.enemy_model.attack_probability() >= self.params.defend_probability:
+            self.defend(game_state)
 
     # Base defense of turrets, walls, interceptors, and supports
+    @profiled('base_funnel')
     def base_funnel(self, game_state, attacking):
+        self.funnel_planner(game_state, attacking).execute(game_state)
+
+        if attacking:
+            self.board.spawn(game_state, WALL, self.layouts['corners'].locations) # Place walls in case turrets aren't created
+
+    def funnel_planner(self, game_state, attacking):
+        # Every helper only adds candidates; the planner spends SP across all of them
+        planner = ActionPlanner(self.board, game_state.get_resource(SP, 0))
 
         # Base wall
-        self.place_base_walls(game_state, attacking)
+        self.place_base_walls(game_state, attacking, planner)
 
         # Turrets
-        self.place_turrets(game_state)
-
-        if attacking:
-            game_state.attempt_spawn(WALL, [[0, 13], [2, 13]]) # Place walls in case turrets aren't created
+        self.place_turrets(game_state, planner)
 
         # Supports
-        if game_state.get_resource(SP, 0) >= 4:
-            self.place_supports(game_state)
-
-    def place_base_walls(self, game_state, attacking):
-        left = [[3, 13], [4, 12], [5, 11], [6, 11], [7, 10], [8, 10], [10, 10], [11, 9], [13, 8]]
-        right = [[27, 13], [26, 13], [25, 13], [24, 13], [23, 12], [22, 11], [21, 11], [20, 10], [19, 10], [17, 10], [16, 9], [14, 8]]
-
-        locations = left + right
-
-        if not attacking:
-            locations.append([1, 13])
-
-        if game_state.turn_number < 2 or not self.can_place_corner_turrets(game_state):
-            locations.append([0, 13])
-            locations.append([2, 13])
-        elif self.can_place_corner_turrets(game_state):
-            if game_state.contains_stationary_unit([0, 13]) and game_state.game_map[0, 13][0].unit_type == WALL:
-                game_state.attempt_remove([0, 13])
-            if game_state.contains_stationary_unit([2, 13]) and game_state.game_map[2, 13][0].unit_type == WALL:
-                game_state.attempt_remove([2, 13])
-
-        game_state.attempt_spawn(WALL, locations)
-
-        upgrade_locations = []
-        for location in locations:
-            if game_state.contains_stationary_unit(location) and game_state.game_map[location[0], location[1]][0].unit_type == WALL:
-                if game_state.game_map[location[0], location[1]][0].health < 80 and game_state.game_map[location[0], location[1]][0].upgraded:
-                    game_state.attempt_remove(location)
-                elif game_state.game_map[location[0], location[1]][0].health < 30 and not game_state.game_map[location[0], location[1]][0].upgraded:
-                    game_state.attempt_remove(location)
-                elif not game_state.game_map[location[0], location[1]][0].upgraded and game_state.turn_number >= 6:
-                    upgrade_locations.append(location)
-
-        if game_state.turn_number > 4:
-            game_state.attempt_upgrade(left[:1] + right[:4])
-            if game_state.contains_stationary_unit([1, 13]):
-                game_state.attempt_upgrade([1, 13])
-
-        if game_state.get_resource(SP, 0) > len(upgrade_locations) and game_state.turn_number >= 6:
-            game_state.attempt_upgrade(upgrade_locations)
-
-    def place_turrets(self, game_state):
-        turret_locations = [[18, 10], [9, 10], [6, 10], [21, 10], [24, 12], [3, 12], [12, 8], [15, 8]]
-        if game_state.turn_number >= 4 and game_state.get_resource(SP, 0) >= 4:
-            turret_locations.append([7, 12])
-            turret_locations.append([20, 12])
-        if game_state.turn_number >= 4 and game_state.get_resource(SP, 0) >= 4:
-            turret_locations.append([11, 8])
-            turret_locations.append([16, 8])
-
-        if self.can_place_corner_turrets(game_state):
-            game_state.attempt_spawn(TURRET, [[0, 13], [2, 13]])
-            if game_state.contains_stationary_unit([0, 13]) and game_state.contains_stationary_unit([2, 13]):
-                if game_state.game_map[0, 13][0].unit_type == TURRET and game_state.game_map[2, 13][0].unit_type == TURRET and game_state.get_resource(SP, 0) >= 10:
-                    game_state.attempt_upgrade([[0, 13], [2, 13]])
-            
-        game_state.attempt_spawn(TURRET, turret_locations)
-
-        for location in turret_locations:
-            if game_state.contains_stationary_unit(location) and game_state.game_map[location[0], location[1]][0].unit_type == TURRET:
-                if game_state.game_map[location[0], location[1]][0].health < 30:
-                    game_state.attempt_remove(location)
-
-        if game_state.get_resource(SP, 0) > 30 and game_state.turn_number >= 6:
-            game_state.attempt_upgrade(turret_locations)
-
-    def place_supports(self, game_state):
-        support_locations = []
-        if game_state.turn_number >= 3:
-            support_locations.append([7, 9])
-            support_locations.append([8, 9])
-        if game_state.turn_number >= 5:
-            support_locations.append([7, 8])
-            support_locations.append([8, 8])
-
-        game_state.attempt_spawn(SUPPORT, support_locations)
-
-        if game_state.get_resource(SP, 0) > 20 and game_state.turn_number >= 6:
-            game_state.attempt_upgrade(support_locations)
-
-    def infiltrate(self, game_state):
+        if game_state.get_resource(SP, 0) >= self.params.support_sp:
+            self.place_supports(game_state, planner)
+        return planner
 
-        suicide_interceptor_location = [3, 10]
-        suicide_interceptor_num = self.get_num_interceptors(game_state)
+    @profiled('search_turn')
+    def search_turn(self, game_state):
+        """
+        Lets TurnSearch choose between holding, defending, opening the
+        funnel gap, waiting with it open and attacking, and what to build
+        with each, instead of the fixed sequence in starter_strategy.
+        """
+        from turn_search import TurnOption, HOLD, DEFEND, OPEN, WAIT, ATTACK, MODE_NAMES
+        params = self.params
+        wave = self.plan_wave(game_state, game_state.get_resource(MP, 0))
+        next_wave = self.plan_wave(game_state, game_state.project_future_MP(1, 0))
+        now = wave.scored if wave is not None else 0
+        later = params.next_turn_discount * (next_wave.scored if next_wave is not None else 0)
+
+        hold = self.funnel_planner(game_state, False)
+        # Interceptors are only worth their MP once an attack is likelier than defend_probability
+        defend = params.defend_value * params.defense_interceptors * (self.enemy_model.attack_probability() - params.defend_probability)
+        options = [TurnOption(HOLD, hold, 0, ()), TurnOption(DEFEND, hold, defend, ())]
+        if game_state.turn_number >= params.attack_turn and self.structures_placed(game_state):
+            attack = self.funnel_planner(game_state, True)
+            if any(self.board.contains_stationary_unit(location) for location in FUNNEL_GAP):
+                options.append(TurnOption(OPEN, attack, params.score_value * later, FUNNEL_GAP))
+            else:
+                options.append(TurnOption(WAIT, attack, params.score_value * later, ()))
+                # Once hoard_mp is saved, waiting is worth no more than attacking
+                hoarded = game_state.get_resource(MP, 0) >= params.hoard_mp
+                if now > 0 or hoarded:
+                    # A wave predicted to end the game beats every other option
+                    value = float('inf') if now >= game_state.enemy_health else params.score_value * (max(now, later) if hoarded else now)
+                    options.append(TurnOption(ATTACK, attack, value, ()))
+
+        deadline = time.perf_counter() + min(params.search_budget, self.profiler.remaining())
+        search = self.turn_search
+        best = search.search(self.board, self.state.damage_maps, self.state.path_cache, options, deadline)
+        option = options[best.option]
+        if search.error is not None:
+            gamelib.debug_write('Turn search cut short: {!r}'.format(search.error))
+        if PROFILE:
+            gamelib.debug_write('Turn search: {} scoring {:.1f} after {} plans over {} levels'.format(
+                MODE_NAMES[option.mode], best.score, search.evaluated, search.levels))
+
+        option.planner.execute(game_state, search.turn_plan(option, best.bought))
+        if option.mode == ATTACK:
+            self.board.spawn(game_state, WALL, self.layouts['corners'].locations)
+            self.infiltrate(game_state)
+        elif option.mode == DEFEND:
+            self.defend(game_state)
 
-        attacker_scout_location = [14, 0]
-        attacker_scout_num = self.get_num_scouts(game_state, suicide_interceptor_num)
+    def place_base_walls(self, game_state, attacking, planner):
+        board = self.board
+        corners = self.layouts['corners'].locations
 
-        for _ in range(suicide_interceptor_num):
-            game_state.attempt_spawn(INTERCEPTOR, suicide_interceptor_location)
-        for _ in range(attacker_scout_num):
-            game_state.attempt_spawn(SCOUT, attacker_scout_location)
+        corner_walls = game_state.turn_number < self.params.corner_turret_turn or not self.can_place_corner_turrets(game_state)
+        if not corner_walls:
+            planner.remove(board.select(corners, WALL))
 
-    def get_num_interceptors(self, game_state):
-        max_health = 0
-        if game_state.contains_stationary_unit([1, 14]):
-            max_health = game_state.game_map[1, 14][0].health
-        if game_state.contains_stationary_unit([0, 14]):
-            h = game_state.game_map[0, 14][0].health
-            max_health = h if h > max_health else max_health
+        walls = self.layouts[('walls', attacking, corner_walls)]
+        planner.add_policies(walls.policies, game_state.turn_number, self.params.wall_value, self.params.wall_upgrade_value)
 
-        if self.get_damage_at_spawn(game_state, [3, 10]) > 30:
-            if max_health <= 50:
-                return 6
-            return 7
+    def get_turret_layout(self, game_state):
+        late = game_state.turn_number >= self.params.late_turret_turn and game_state.get_resource(SP, 0) >= self.params.late_turret_sp
+        if not late:
+            return self.layouts[('turrets', False, ())]
+        return self.layouts[('turrets', True, self.queries.get('optional_turrets', (), self.choose_optional_turrets))]
 
-        return 3 if max_health <= 60 else 4
+    def overlay(self):
+        # The table outlives this board, so the damage maps must include our spawns
+        self.state.resync()
+        return BoardOverlay(self.board, self.state.damage_maps, self.state.path_cache, self.positions)
 
-    def get_num_scouts(self, game_state, interceptor_num):
-        return trunc(game_state.get_resource(MP, 0) - interceptor_num)
+    def choose_optional_turrets(self):
+        return choose_optional_turrets(self.board, self.overlay(), self.layouts, self.params)
 
-    def get_damage_at_spawn(self, game_state, spawn):
-        path = game_state.find_path_to_edge(spawn)
-        damage = 0
-        for path_location in path:
-            damage += len(game_state.get_attackers(path_location, 0)) * gamelib.GameUnit(TURRET, game_state.config).damage_i
+    def place_turrets(self, game_state, planner):
+        params = self.params
+        turrets = self.get_turret_layout(game_state)
+        corners = self.layouts['corners'].locations
 
-        return damage
+        if self.can_place_corner_turrets(game_state):
+            planner.spawn(TURRET, corners, params.corner_turret_value)
+            if game_state.get_resource(SP, 0) >= params.corner_upgrade_sp:
+                planner.upgrade(corners, params.corner_upgrade_value, TURRET)
+
+        # Rebuild the turrets covering the most enemy routes first
+        threats = self.queries.get('threats', (), self.threat_analysis)
+        turret_range = self.board.stats.get(TURRET).attack_range
+        turret_value = lambda location: params.turret_value + params.threat_weight * threats.coverage(location, turret_range)
+        planner.add_policies(turrets.policies, game_state.turn_number, turret_value, params.turret_upgrade_value,
+                             upgrade=game_state.get_resource(SP, 0) > params.turret_upgrade_sp)
+
+    def threat_analysis(self):
+        self.state.resync()
+        return self.threats.update(self.board, self.state.damage_maps[0], self.state.path_cache)
+
+    def place_supports(self, game_state, planner):
+        params = self.params
+        phase = 2 if game_state.turn_number >= params.late_support_turn else 1 if game_state.turn_number >= params.early_support_turn else 0
+        supports = self.layouts[('supports', phase)]
+        if not supports:
+            return
+
+        planner.spawn(SUPPORT, supports.locations, params.support_value)
+
+        if game_state.get_resource(SP, 0) > params.support_upgrade_sp and game_state.turn_number >= params.support_upgrade_turn:
+            planner.upgrade(supports.locations, params.support_upgrade_value, SUPPORT)
+
+    @profiled('infiltrate')
+    def infiltrate(self, game_state):
+        # Re-plan against the board as the funnel left it
+        wave = self.plan_wave(game_state, game_state.get_resource(MP, 0))
+        if wave is None:
+            return
+
+        planner = ActionPlanner(self.board, 0, game_state.get_resource(MP, 0))
+        planner.deploy(INTERCEPTOR, SUICIDE_INTERCEPTOR_LOCATION, wave.interceptors, 2)
+        planner.deploy(SCOUT, wave.spawn, None, 1)
+        planner.execute(game_state)
+
+    def defend(self, game_state):
+        # Units from the enemy's top-left edge head for our right side
+        side, _ = self.enemy_model.likely_side()
+        location = DEFENSE_INTERCEPTOR_LOCATIONS[1] if side == TOP_LEFT else DEFENSE_INTERCEPTOR_LOCATIONS[0]
+        planner = ActionPlanner(self.board, 0, game_state.get_resource(MP, 0))
+        planner.deploy(INTERCEPTOR, location, self.params.defense_interceptors, 1)
+        planner.execute(game_state)
+
+    @profiled('plan_wave')
+    def plan_wave(self, game_state, mp):
+        """
+        Simulates every interceptor/scout split of mp from the best few
+        spawns, with the funnel gap open as it will be when we attack.
+        """
+        # Spawn scoring degrades to the single best spawn late in the turn
+        candidate_spawns = self.params.candidate_spawns if self.profiler.can_afford(1.0) else 1
+        # Until our structures change, repeat calls reuse the scores and the wave
+        return self.queries.get('plan_wave', (mp, candidate_spawns), lambda: self.simulate_wave(mp, candidate_spawns))
+
+    def simulate_wave(self, mp, candidate_spawns):
+        path_finder = self.state.path_finder(attack_blocked(self.board))
+        scores = self.queries.get('spawn_scores', (), lambda: score_spawns(path_finder, self.damage_map))
+        # With no breaching spawn, the wave goes from the fixed scout spawn
+        # and is judged on the structures it breaks open for the next one
+        spawns = [row.spawn for row in scores[:candidate_spawns] if row.breach] or [FALLBACK_SCOUT_SPAWN]
+        return WaveSimulator(self.config, self.board, path_finder).best_wave(mp, spawns, SUICIDE_INTERCEPTOR_LOCATION,
+                                                                        self.params.max_interceptors)
 
     def structures_placed(self, game_state):
-        locations = [[0, 13], [2, 13], [3, 13], [4, 12], [5, 11], [6, 11], [7, 10], [8, 10], [9, 10], [10, 10], [11, 9], [12, 8], [13, 8], [15, 8], [27, 13], [26, 13], [25, 13], [24, 13], [23, 12], [22, 11], [21, 11], [20, 10], [18, 10], [19, 10], [17, 10], [16, 9], [14, 8]]
-
-        for location in locations:
-            if not game_state.contains_stationary_unit(location):
-                return False
-        return True
+        return self.queries.get('structures_placed', (), lambda: not self.board.occupancy().empty(self.layouts['funnel'].mask))
 
     def can_place_corner_turrets(self, game_state):
-        return game_state.get_resource(SP, 0) >= 4
+        if game_state.get_resource(SP, 0) < self.params.corner_turret_sp:
+            return False
+        return self.queries.get('corner_turret_gain', (), self.corner_turret_gain) > self.params.corner_turret_gain
+
+    def corner_turret_gain(self):
+        return corner_turret_gain(self.board, self.overlay(), self.layouts['corners'])
+
+    def speculate(self, board, damage_maps, path_cache):
+        """
+        Runs on the background worker against next turn's expected board,
+        with its own damage maps and path cache, and yields the queries the
+        turn would otherwise compute first.
+        """
+        yield ('spawn_scores', ()), score_spawns(path_cache.get(attack_blocked(board)), damage_maps[1])
+        yield ('threats', ()), ThreatAnalysis().update(board, damage_maps[0], path_cache)
+        overlay = BoardOverlay(board, damage_maps, path_cache)
+        yield ('corner_turret_gain', ()), corner_turret_gain(board, overlay, self.layouts['corners'])
+        yield ('optional_turrets', ()), choose_optional_turrets(board, overlay, self.layouts, self.params)
+
+    def adopt_speculation(self):
+        """Seeds this turn's queries from the background worker if it analysed this exact layout."""
+        if self.background is None:
+            return
+        speculation = self.background.collect()
+        if self.background.error is not None:
+            gamelib.debug_write('Background analysis failed: {!r}'.format(self.background.error))
+            self.background.error = None
+        if speculation is None or speculation.layout != self.board.layout_key():
+            return
+        for finder in speculation.finders:
+            self.state.path_cache.put(finder)
+        for (name, args), value in speculation.results.items():
+            self.queries.seed(name, args, value)
+        self.threats = speculation.results.get(('threats', ()), self.threats)
 
     def on_action_frame(self, turn_string):
-        pass
+        """
+        Only the breach, damage and death events are decoded from each frame
+        here; the background worker reads the board from it.
+        """
+        self.action_frames.consume(turn_string)
+        if self.background is not None:
+            self.background.submit(turn_string)
 
 
 if __name__ == "__main__":
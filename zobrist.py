@@ -0,0 +1,116 @@
+"""
+Zobrist hashing of structure layouts and a transposition table keyed by it.
+
+Searches and what-if checks reach the same layout by different routes.
+Examples are removing the corner walls before or after placing the corner
+turrets, or holding versus defending with the same build. Each (tile,
+structure type, owner, upgraded) gets a fixed random 64-bit key, and a
+layout's hash is the XOR of the keys of its structures. Adding, removing
+or upgrading one structure is then two XORs. BoardSnapshot and BoardOverlay
+keep their hash up to date this way instead of rescanning the board.
+
+Health and pending removals are not hashed. Everything cached under a hash
+(paths, turret damage, defense values) depends only on which structures
+stand where, so entries stay valid from turn to turn. Two different
+layouts sharing a 64-bit hash is possible, but too unlikely to guard
+against.
+
+TranspositionTable is a bounded LRU map from (query name, hash, args) to a
+result. It keeps hit, miss and eviction counts and an estimate of its
+memory, so its size can be set against the engine's memory limit.
+"""
+import hashlib
+import sys
+from array import array
+from collections import namedtuple
+
+from arena import NUM_TILES
+
+STRUCTURE_KINDS = 3
+# Deterministic, so every process (and every pool worker) agrees on hashes
+KEYS = array('Q', hashlib.shake_128(b'zobrist').digest(8 * NUM_TILES * STRUCTURE_KINDS * 4))
+
+TableStats = namedtuple('TableStats', ['entries', 'size', 'hits', 'misses', 'evictions', 'hit_rate', 'bytes'])
+
+
+def structure_hash(i, structure):
+    """Key of (unit type index, owner, upgraded) on tile i; 0 for an empty tile."""
+    if structure is None:
+        return 0
+    t, owner, upgraded = structure
+    return KEYS[((i * STRUCTURE_KINDS + t) * 2 + owner) * 2 + bool(upgraded)]
+
+
+def board_hash(board):
+    """Hash of a BoardSnapshot's layout from scratch."""
+    h = 0
+    unit_type, owner, upgraded = board.unit_type, board.owner, board.upgraded
+    for i in range(NUM_TILES):
+        t = unit_type[i]
+        if t >= 0:
+            h ^= KEYS[((i * STRUCTURE_KINDS + t) * 2 + owner[i]) * 2 + upgraded[i]]
+    return h
+
+
+class TranspositionTable:
+    def __init__(self, size=4096):
+        self.size = size
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, compute):
+        """Cached compute() for key, most recently used entries kept."""
+        entries = self._entries
+        try:
+            value = entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            value = compute()
+            if len(entries) >= self.size:
+                del entries[next(iter(entries))]
+                self.evictions += 1
+        else:
+            self.hits += 1
+        entries[key] = value
+        return value
+
+    def lookup(self, key, default=None):
+        """The cached value, or default on a miss; nothing is computed."""
+        entries = self._entries
+        try:
+            value = entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self.hits += 1
+        entries[key] = value
+        return value
+
+    def store(self, key, value):
+        entries = self._entries
+        entries.pop(key, None)
+        if len(entries) >= self.size:
+            del entries[next(iter(entries))]
+            self.evictions += 1
+        entries[key] = value
+
+    def clear(self):
+        self._entries.clear()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def memory(self):
+        """Rough bytes held: the dict plus each key and value, without shared objects they point to."""
+        entries = self._entries
+        return sys.getsizeof(entries) + sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in entries.items())
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return TableStats(len(self._entries), self.size, self.hits, self.misses, self.evictions,
+                          self.hits / lookups if lookups else 0.0, self.memory())